@@ -1,41 +1,95 @@
-from flask import Flask, jsonify
+import logging
+from flask import Flask, jsonify, current_app
 from flask_cors import CORS
+from sqlalchemy import event, inspect
 from config import config
 from database import db
+from cache import cache
+from json_provider import OrjsonProvider
+from models import CheckIn
+from blueprints import ALL_BP
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Use WAL so readers don't block on writers, and relax per-commit fsyncs"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=268435456")
+    cursor.execute("PRAGMA cache_size=-20000")
+    cursor.close()
+
+def mark_batch_loaded(target, context):
+    """Tag instances that were loaded as part of a multi-row result"""
+    # Logic: The listeners are global, so apps without detection skip them
+    if not current_app.config.get('LAZY_LOAD_DETECTION'):
+        return
+    batch = context.attributes.setdefault('lazy_load_batch', [])
+    batch.append(target)
+    if len(batch) == 2:
+        inspect(batch[0]).info['batch_loaded'] = True
+    if len(batch) > 1:
+        inspect(target).info['batch_loaded'] = True
+
+def report_lazy_load(orm_execute_state):
+    """Flag lazy loads on batch-loaded instances, i.e. N+1 queries, during development"""
+    if not current_app.config.get('LAZY_LOAD_DETECTION'):
+        return
+    if not orm_execute_state.is_select or orm_execute_state.lazy_loaded_from is None:
+        return
+    if not orm_execute_state.lazy_loaded_from.info.get('batch_loaded'):
+        return
+    
+    message = (
+        f"N+1 lazy load from {orm_execute_state.lazy_loaded_from.class_.__name__} instances; "
+        "eager-load the relationship (e.g. selectinload) instead"
+    )
+    if current_app.config.get('LAZY_LOAD_RAISE'):
+        raise RuntimeError(message)
+    logging.getLogger('lazyload').warning(message)
+
+def init_db():
+    """Create any missing tables and indexes (requires an app context)"""
+    db.create_all()
+    
+    # create_all() skips tables that already exist, so add any indexes
+    # introduced after an existing database was first created
+    for index in CheckIn.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
 
 def create_app(config_name='default'):
     """Application factory pattern"""
     app = Flask(__name__)
+    app.json = OrjsonProvider(app)
     
     # Load configuration
     app.config.from_object(config[config_name])
     
     # Initialize extensions with app
     db.init_app(app)
-    CORS(app)
-    
-    # Import models (needed for db.create_all())
-    from models import Habit, CheckIn, Category
-    
-    # Import blueprints
-    from routes.habits import habits_bp
-    from routes.checkins import checkins_bp
-    from routes.analytics import analytics_bp
-    from routes.categories import categories_bp
-    from routes.reports import reports_bp
-    from routes.ai import ai_bp
+    cache.init_app(app)
+    CORS(app, origins=app.config['CORS_ORIGINS'], expose_headers=['X-Report-Truncated'])
     
     # Register blueprints
-    app.register_blueprint(habits_bp)
-    app.register_blueprint(checkins_bp)
-    app.register_blueprint(analytics_bp)
-    app.register_blueprint(categories_bp)
-    app.register_blueprint(reports_bp)
-    app.register_blueprint(ai_bp)
-    
-    # Create database tables
+    for bp in ALL_BP:
+        app.register_blueprint(bp)
+    
+    # Configure SQLite connections
     with app.app_context():
-        db.create_all()
+        if db.engine.dialect.name == 'sqlite':
+            event.listen(db.engine, 'connect', set_sqlite_pragmas)
+    
+    # Surface lazy-load regressions while developing
+    if app.config.get('LAZY_LOAD_DETECTION') and not event.contains(db.session, 'do_orm_execute', report_lazy_load):
+        event.listen(db.Model, 'load', mark_batch_loaded, propagate=True)
+        event.listen(db.session, 'do_orm_execute', report_lazy_load)
+    
+    # Create database tables once per deployment, not on every worker start
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create database tables and indexes"""
+        init_db()
+        print("Database initialized")
     
     # Basic route
     @app.route('/')
@@ -45,5 +99,11 @@ def create_app(config_name='default'):
     return app
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
     app = create_app('development')
+    
+    # The dev server creates tables itself so `python app.py` keeps working on a fresh checkout
+    with app.app_context():
+        init_db()
+    
     app.run(debug=True, port=5000)
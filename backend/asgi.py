@@ -0,0 +1,17 @@
+"""
+ASGI entry point for Habit Hero
+Wraps the Flask app so it can be served by Uvicorn:
+
+    uvicorn asgi:app --workers 4 --loop uvloop --http httptools
+"""
+
+import logging
+from asgiref.wsgi import WsgiToAsgi
+from app import create_app
+
+# Root logging is configured once here (and in app.py for the dev server)
+logging.basicConfig(level=logging.INFO)
+
+# Each request runs in asgiref's thread pool, so a slow /ai/* call no
+# longer blocks the other habit endpoints
+app = WsgiToAsgi(create_app('production'))
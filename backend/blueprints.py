@@ -0,0 +1,14 @@
+"""
+Blueprint registry for Habit Hero
+Route modules are imported once at module load; create_app only attaches them
+"""
+
+from routes.habits import habits_bp
+from routes.checkins import checkins_bp
+from routes.analytics import analytics_bp
+from routes.categories import categories_bp
+from routes.reports import reports_bp
+from routes.ai import ai_bp
+
+# Registration order matters: analytics_bp owns GET /habits/analytics
+ALL_BP = [habits_bp, checkins_bp, analytics_bp, categories_bp, reports_bp, ai_bp]
@@ -0,0 +1,26 @@
+from datetime import timezone
+from flask import jsonify, request
+from flask_caching import Cache
+from werkzeug.http import generate_etag
+
+# Create a single Cache instance
+cache = Cache()
+
+def conditional_response(payload, last_modified=None):
+    """
+    Tag the JSON response with an ETag and answer 304 if the client already has it
+    
+    last_modified (a datetime) is added to the body as 'last_updated' and sent
+    as Last-Modified, but stays out of the ETag so a recompute of unchanged
+    data still matches the client's copy.
+    """
+    response = jsonify(payload)
+    if last_modified is None:
+        response.add_etag(weak=True)
+    else:
+        etag = generate_etag(response.get_data())
+        response = jsonify({**payload, 'last_updated': last_modified})
+        response.set_etag(etag, weak=True)
+        response.last_modified = last_modified.astimezone(timezone.utc)
+    response.headers['Cache-Control'] = 'private, must-revalidate'
+    return response.make_conditional(request)
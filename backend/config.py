@@ -1,6 +1,7 @@
 import os
 from datetime import timedelta
 from dotenv import load_dotenv
+from sqlalchemy.pool import StaticPool
 
 # Load environment variables from .env file
 load_dotenv()
@@ -9,6 +10,14 @@ load_dotenv()
 basedir = os.path.abspath(os.path.dirname(__file__))
 instance_dir = os.path.join(basedir, 'instance')
 
+def _engine_options(database_uri, **options):
+    """Engine options for database_uri, adding the SQLite-only connect_args for SQLite URLs"""
+    # Logic: check_same_thread and timeout are sqlite3 arguments; other
+    # drivers such as psycopg2 reject them
+    if database_uri.startswith('sqlite'):
+        options['connect_args'] = {'check_same_thread': False, 'timeout': 30}
+    return options
+
 class Config:
     """Base configuration class"""
     # Use a persistent SQLite database file in the instance directory
@@ -16,23 +25,59 @@ class Config:
     db_uri_path = os.path.join(instance_dir, "habits.db").replace('\\', '/')
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or f'sqlite:///{db_uri_path}'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = _engine_options(SQLALCHEMY_DATABASE_URI, pool_size=10, pool_pre_ping=True)
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
+    # In-process cache for the single-process dev server; production shares one across workers
+    CACHE_TYPE = os.environ.get('CACHE_TYPE') or 'SimpleCache'
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL')
+    CACHE_DEFAULT_TIMEOUT = 3600
+    # Caps on what a PDF report processes: the first N habits, and each habit's most recent check-ins
+    REPORT_MAX_HABITS = int(os.environ.get('REPORT_MAX_HABITS') or 200)
+    REPORT_MAX_CHECKINS_PER_HABIT = int(os.environ.get('REPORT_MAX_CHECKINS_PER_HABIT') or 730)
+    # Comma-separated list of frontend origins allowed to call the API
+    CORS_ORIGINS = tuple(
+        origin.strip()
+        for origin in (os.environ.get('CORS_ORIGINS') or 'http://localhost:3000,http://127.0.0.1:3000').split(',')
+    )
 
 class DevelopmentConfig(Config):
     """Development configuration"""
     DEBUG = True
+    # Raise on N+1 lazy loads so they fail fast in development
+    LAZY_LOAD_DETECTION = True
+    LAZY_LOAD_RAISE = True
     # Use absolute path for local development
     SQLALCHEMY_DATABASE_URI = f'sqlite:///{os.path.join(instance_dir, "habits.db").replace(os.sep, "/")}'
+    SQLALCHEMY_ENGINE_OPTIONS = _engine_options(SQLALCHEMY_DATABASE_URI, pool_size=10, pool_pre_ping=True)
 
 class ProductionConfig(Config):
     """Production configuration"""
     DEBUG = False
     # Use relative path for production deployment
     SQLALCHEMY_DATABASE_URI = 'sqlite:///./instance/habits.db'
+    SQLALCHEMY_ENGINE_OPTIONS = _engine_options(
+        SQLALCHEMY_DATABASE_URI, pool_size=20, max_overflow=10, pool_pre_ping=True
+    )
+    # Logic: Uvicorn runs several worker processes, so cached entries and their
+    # invalidation must be shared; files in the instance directory need no server
+    CACHE_TYPE = os.environ.get('CACHE_TYPE') or 'FileSystemCache'
+    CACHE_DIR = os.environ.get('CACHE_DIR') or os.path.join(instance_dir, 'cache')
+
+class TestingConfig(Config):
+    """Testing configuration"""
+    TESTING = True
+    # In-memory database shared by every thread through a single StaticPool connection
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'poolclass': StaticPool,
+        'connect_args': {'check_same_thread': False}
+    }
+    CACHE_TYPE = 'NullCache'
 
 config = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
+    'testing': TestingConfig,
     'default': DevelopmentConfig
 }
@@ -29,11 +29,47 @@ class Habit(db.Model):
             'description': self.description,
             'frequency': self.frequency,
             'category': self.category,
-            'start_date': self.start_date.isoformat() if self.start_date else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'start_date': self.start_date,
+            'created_at': self.created_at
         }
 
+# Habit columns in to_dict() order, for read-only select() queries that skip ORM instances
+HABIT_COLUMNS = (
+    Habit.id,
+    Habit.name,
+    Habit.description,
+    Habit.frequency,
+    Habit.category,
+    Habit.start_date,
+    Habit.created_at
+)
+
+def habit_row_to_dict(row):
+    """Serialize a HABIT_COLUMNS row like Habit.to_dict(), with ISO date strings for the report code"""
+    return {
+        'id': row.id,
+        'name': row.name,
+        'description': row.description,
+        'frequency': row.frequency,
+        'category': row.category,
+        'start_date': row.start_date.isoformat() if row.start_date else None,
+        'created_at': row.created_at.isoformat() if row.created_at else None
+    }
+
 class CheckIn(db.Model):
+    # One check-in per habit per day; the index also serves
+    # "WHERE habit_id = ? ORDER BY date DESC" without a sort step
+    __table_args__ = (
+        db.Index('ix_checkin_habit_date', 'habit_id', db.text('date DESC'), unique=True),
+        # Covers streak and stats lookups, which only read completed dates;
+        # the predicate matches how completed.is_(True) renders
+        db.Index(
+            'ix_checkin_habit_completed_date', 'habit_id', 'date',
+            sqlite_where=db.text('completed IS 1'),
+            postgresql_where=db.text('completed IS TRUE')
+        ),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     habit_id = db.Column(db.Integer, db.ForeignKey('habit.id'), nullable=False)
     date = db.Column(db.Date, nullable=False)
@@ -45,8 +81,33 @@ class CheckIn(db.Model):
         return {
             'id': self.id,
             'habit_id': self.habit_id,
-            'date': self.date.isoformat() if self.date else None,
+            'date': self.date,
             'notes': self.notes,
             'completed': self.completed,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
\ No newline at end of file
+            'created_at': self.created_at
+        }
+
+# CheckIn columns in to_dict() order, for read-only select() queries that skip ORM instances
+CHECKIN_COLUMNS = (
+    CheckIn.id,
+    CheckIn.habit_id,
+    CheckIn.date,
+    CheckIn.notes,
+    CheckIn.completed,
+    CheckIn.created_at
+)
+
+# Keys for serializing CHECKIN_COLUMNS rows as-is (extra trailing columns are ignored);
+# the JSON provider formats the date values
+CHECKIN_KEYS = tuple(column.key for column in CHECKIN_COLUMNS)
+
+def checkin_row_to_dict(row):
+    """Serialize a CHECKIN_COLUMNS row like CheckIn.to_dict(), with ISO date strings for the report code"""
+    return {
+        'id': row.id,
+        'habit_id': row.habit_id,
+        'date': row.date.isoformat() if row.date else None,
+        'notes': row.notes,
+        'completed': row.completed,
+        'created_at': row.created_at.isoformat() if row.created_at else None
+    }
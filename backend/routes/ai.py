@@ -4,21 +4,39 @@ Provides habit suggestions and analysis using Google Gemini
 """
 
 from flask import Blueprint, request, jsonify
-from services.ai_service import AIService
+from sqlalchemy import select
+from services.ai_service import get_ai_service
 from models import Habit, CheckIn
 from database import db
+from cache import cache
 import logging
 
 # Create blueprint
 ai_bp = Blueprint('ai', __name__)
 
-# Initialize AI service
-try:
-    ai_service = AIService()
-    logging.info("AI service initialized successfully")
-except Exception as e:
-    logging.error(f"Failed to initialize AI service: {str(e)}")
-    ai_service = None
+# Shared AI service (so its HTTP connection pool is reused), created on the
+# first AI request so app startup does not import the Gemini SDK
+ai_service = None
+
+def _get_ai_service():
+    """Return the shared AI service, or None if it cannot be initialized"""
+    global ai_service
+    if ai_service is None:
+        try:
+            ai_service = get_ai_service()
+            logging.info("AI service initialized successfully")
+        except Exception as e:
+            logging.error(f"Failed to initialize AI service: {str(e)}")
+    return ai_service
+
+# Cache keys and lifetimes for AI responses
+AI_CATEGORIES_CACHE_KEY = 'ai_categories_v1'
+AI_CATEGORIES_TIMEOUT = 86400
+AI_HEALTH_CACHE_KEY = 'ai_health_v1'
+AI_HEALTH_TIMEOUT = 60
+
+# Habit columns the AI prompts actually read
+PROMPT_HABIT_COLUMNS = (Habit.id, Habit.name, Habit.frequency, Habit.category, Habit.start_date)
 
 @ai_bp.route('/ai/suggestions', methods=['GET', 'POST'])
 def get_habit_suggestions():
@@ -49,6 +67,7 @@ def get_habit_suggestions():
     }
     """
     try:
+        ai_service = _get_ai_service()
         if not ai_service:
             return jsonify({
                 'error': 'AI service not available. Please check API key configuration.'
@@ -57,17 +76,8 @@ def get_habit_suggestions():
         # Get existing habits from database (with error handling)
         existing_habits = []
         try:
-            habits_query = Habit.query.all()
-            
-            for habit in habits_query:
-                existing_habits.append({
-                    'id': habit.id,
-                    'name': habit.name,
-                    'description': habit.description,
-                    'frequency': habit.frequency,
-                    'category': habit.category,
-                    'start_date': habit.start_date
-                })
+            rows = db.session.execute(select(*PROMPT_HABIT_COLUMNS)).all()
+            existing_habits = [dict(row._mapping) for row in rows]
         except Exception as db_error:
             logging.warning(f"Database access failed, using empty habits list: {str(db_error)}")
             existing_habits = []
@@ -88,7 +98,7 @@ def get_habit_suggestions():
                 if habit['category'] not in exclude_categories
             ]
         
-        # Generate AI suggestions
+        # Generate AI suggestions (the service caches responses per prompt, never the fallback)
         suggestions = ai_service.generate_habit_suggestions(existing_habits, user_goals)
         
         return jsonify({
@@ -120,36 +130,21 @@ def analyze_habits():
     }
     """
     try:
+        ai_service = _get_ai_service()
         if not ai_service:
             return jsonify({
                 'error': 'AI service not available. Please check API key configuration.'
             }), 500
         
-        # Get habits and check-ins from database
-        habits = []
-        habits_query = Habit.query.all()
-        
-        for habit in habits_query:
-            habits.append({
-                'id': habit.id,
-                'name': habit.name,
-                'description': habit.description,
-                'frequency': habit.frequency,
-                'category': habit.category,
-                'start_date': habit.start_date
-            })
+        # Get habits and check-ins from database, selecting only the columns
+        # the analysis uses (success rates only need habit_id and completed)
+        habit_rows = db.session.execute(select(*PROMPT_HABIT_COLUMNS)).all()
+        habits = [dict(row._mapping) for row in habit_rows]
         
-        checkins = []
-        checkins_query = CheckIn.query.all()
-        
-        for checkin in checkins_query:
-            checkins.append({
-                'id': checkin.id,
-                'habit_id': checkin.habit_id,
-                'date': checkin.date,
-                'completed': checkin.completed,
-                'notes': checkin.notes
-            })
+        checkin_rows = db.session.execute(
+            select(CheckIn.habit_id, CheckIn.completed)
+        ).all()
+        checkins = [dict(row._mapping) for row in checkin_rows]
         
         # Generate AI analysis
         analysis = ai_service.analyze_habit_patterns(habits, checkins)
@@ -179,15 +174,21 @@ def ai_health_check():
     }
     """
     try:
+        ai_service = _get_ai_service()
         if ai_service:
-            # Test AI service with a simple request
-            test_suggestions = ai_service.generate_habit_suggestions([], "test")
+            # Test AI service with a simple request, at most once per AI_HEALTH_TIMEOUT
+            test_suggestions_count = cache.get(AI_HEALTH_CACHE_KEY)
+            if test_suggestions_count is None:
+                # Logic: Bypass the service's response cache so the probe really reaches Gemini
+                test_suggestions = ai_service.generate_habit_suggestions([], "test", use_cache=False)
+                test_suggestions_count = len(test_suggestions)
+                cache.set(AI_HEALTH_CACHE_KEY, test_suggestions_count, timeout=AI_HEALTH_TIMEOUT)
             
             return jsonify({
                 'status': 'healthy',
                 'message': 'AI service is working properly',
                 'api_configured': True,
-                'test_suggestions_count': len(test_suggestions)
+                'test_suggestions_count': test_suggestions_count
             }), 200
         else:
             return jsonify({
@@ -215,11 +216,20 @@ def get_ai_categories():
     }
     """
     try:
+        ai_service = _get_ai_service()
         if not ai_service:
             return jsonify({
                 'error': 'AI service not available'
             }), 500
         
+        # Categories are near-static, so serve them from cache when possible
+        cached_categories = cache.get(AI_CATEGORIES_CACHE_KEY)
+        if cached_categories is not None:
+            return jsonify({
+                'categories': cached_categories,
+                'message': 'Available habit categories'
+            }), 200
+        
         # Use AI to suggest categories based on common habit types
         prompt = """
         List 10 common habit categories that people typically track for personal development and wellness.
@@ -246,8 +256,11 @@ def get_ai_categories():
             if cat not in valid_categories:
                 valid_categories.append(cat)
         
+        valid_categories = valid_categories[:10]  # Limit to 10 categories
+        cache.set(AI_CATEGORIES_CACHE_KEY, valid_categories, timeout=AI_CATEGORIES_TIMEOUT)
+        
         return jsonify({
-            'categories': valid_categories[:10],  # Limit to 10 categories
+            'categories': valid_categories,
             'message': 'Available habit categories'
         }), 200
         
@@ -1,23 +1,107 @@
-from flask import Blueprint, request, jsonify
+import sqlite3
+from flask import Blueprint, request, jsonify, abort
 from datetime import datetime, timedelta
+from sqlalchemy import select, func, case, cast, distinct, Integer
 from database import db
+from cache import cache, conditional_response
 from models import Habit, CheckIn
 
 # Create blueprint for analytics routes
 analytics_bp = Blueprint('analytics', __name__)
 
+# Overall analytics are recomputed at most every 30s, or sooner after a write
+ANALYTICS_CACHE_KEY = 'analytics:overall'
+ANALYTICS_CACHE_TIMEOUT = 30
+
+def invalidate_analytics():
+    """Drop cached analytics after habits or check-ins change"""
+    cache.delete(ANALYTICS_CACHE_KEY)
+
+# Logic: Window functions (ROW_NUMBER) need SQLite 3.25+
+SQLITE_HAS_WINDOW_FUNCTIONS = sqlite3.sqlite_version_info >= (3, 25, 0)
+
+def _sql_streaks(habit_id, today):
+    """Compute longest streak, current streak and last check-in date in SQL"""
+    # Logic: Consecutive dates share the same julianday(date) - row_number()
+    # value, so grouping on it turns each run of days into one row
+    completed = select(
+        CheckIn.date.label('date'),
+        (func.julianday(CheckIn.date)
+         - func.row_number().over(order_by=CheckIn.date)).label('grp')
+    ).where(
+        CheckIn.habit_id == habit_id,
+        CheckIn.completed.is_(True)
+    ).cte('completed')
+    
+    runs = select(
+        func.count().label('length'),
+        func.min(completed.c.date).label('start_date'),
+        func.max(completed.c.date).label('end_date')
+    ).group_by(completed.c.grp).cte('runs')
+    
+    # Logic: The current streak is the run containing today, counted only up
+    # to today so future-dated check-ins neither break nor inflate it
+    days_to_today = cast(func.julianday(today) - func.julianday(runs.c.start_date) + 1, Integer)
+    current_streak = case(
+        ((runs.c.start_date <= today) & (runs.c.end_date >= today), days_to_today),
+        else_=0
+    )
+    
+    return db.session.execute(
+        select(
+            func.max(runs.c.length).label('longest_streak'),
+            func.max(current_streak).label('current_streak'),
+            func.max(runs.c.end_date).label('last_checkin_date')
+        )
+    ).one()
+
+def _python_streaks(habit_id, today):
+    """Fallback for SQLite without window functions"""
+    # Logic: Stream dates in batches instead of materializing every check-in
+    dates = db.session.scalars(
+        select(CheckIn.date).where(
+            CheckIn.habit_id == habit_id,
+            CheckIn.completed.is_(True)
+        ).order_by(CheckIn.date.desc()).execution_options(yield_per=500)
+    )
+    
+    last_checkin_date = None
+    current_streak = 0
+    longest_streak = None
+    run_length = 0
+    run_end = None
+    previous = None
+    
+    for checkin_date in dates:
+        if previous is None:
+            last_checkin_date = checkin_date
+        if previous is not None and (previous - checkin_date).days == 1:
+            run_length += 1
+        else:
+            run_end = checkin_date
+            run_length = 1
+        # Logic: Inside the run containing today, count only the days up to today
+        if checkin_date <= today <= run_end:
+            current_streak = (today - checkin_date).days + 1
+        longest_streak = max(longest_streak or 0, run_length)
+        previous = checkin_date
+    
+    return longest_streak, current_streak, last_checkin_date
+
 @analytics_bp.route('/habits/<int:habit_id>/streak', methods=['GET'])
 def get_habit_streak(habit_id):
     """Calculate current streak for a specific habit"""
     habit = Habit.query.get_or_404(habit_id)
     
-    # Logic: Get all completed check-ins, ordered by date descending
-    checkins = CheckIn.query.filter_by(
-        habit_id=habit_id, 
-        completed=True
-    ).order_by(CheckIn.date.desc()).all()
+    # Get today's date
+    today = datetime.now().date()
+    
+    if SQLITE_HAS_WINDOW_FUNCTIONS:
+        longest_streak, current_streak, last_checkin_date = _sql_streaks(habit_id, today)
+    else:
+        longest_streak, current_streak, last_checkin_date = _python_streaks(habit_id, today)
     
-    if not checkins:
+    if longest_streak is None:
         return jsonify({
             'habit_id': habit_id,
             'habit_name': habit.name,
@@ -25,131 +109,98 @@ def get_habit_streak(habit_id):
             'longest_streak': 0
         })
     
-    # Logic: Calculate current streak (consecutive days from today backwards)
-    current_streak = 0
-    longest_streak = 0
-    
-    # Get today's date
-    today = datetime.now().date()
-    
-    # Create a set of completed dates for faster lookup
-    completed_dates = {checkin.date for checkin in checkins}
-    
-    # Start counting from today backwards
-    current_date = today
-    streak_count = 0
-    
-    # Check consecutive days backwards from today (up to 365 days max)
-    for _ in range(365):
-        if current_date in completed_dates:
-            streak_count += 1
-            current_date -= timedelta(days=1)
-        else:
-            # Found a gap, stop counting
-            break
-    
-    current_streak = streak_count
-    
-    # Logic: Calculate longest streak
-    temp_streak = 0
-    longest_streak = 0
-    last_date = None
-    
-    for checkin in checkins:
-        if last_date is None:
-            last_date = checkin.date
-            temp_streak = 1
-            longest_streak = 1
-        else:
-            days_diff = (last_date - checkin.date).days
-            if days_diff == 1:  # Consecutive day
-                temp_streak += 1
-                if temp_streak > longest_streak:
-                    longest_streak = temp_streak
-            elif days_diff > 1:  # Gap in dates
-                temp_streak = 1
-                # Don't update longest_streak here, it's already been tracked above
-            last_date = checkin.date
-    
-    # Final check: make sure we didn't miss the last streak
-    longest_streak = max(longest_streak, temp_streak)
-    
     return jsonify({
         'habit_id': habit_id,
         'habit_name': habit.name,
-        'current_streak': current_streak,
+        # Logic: Current streak counts back from today, capped at a year
+        'current_streak': min(current_streak, 365),
         'longest_streak': longest_streak,
-        'last_checkin_date': checkins[0].date.isoformat() if checkins else None
+        'last_checkin_date': last_checkin_date
     })
 
+# Day names indexed by SQLite's strftime('%w')
+WEEKDAY_NAMES = ('Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday')
+
 @analytics_bp.route('/habits/<int:habit_id>/stats', methods=['GET'])
 def get_habit_stats(habit_id):
     """Get comprehensive statistics for a specific habit"""
     habit = Habit.query.get_or_404(habit_id)
     
-    # Logic: Get all check-ins for this habit
-    all_checkins = CheckIn.query.filter_by(habit_id=habit_id).all()
-    completed_checkins = CheckIn.query.filter_by(habit_id=habit_id, completed=True).all()
+    # Logic: Count all and completed check-ins in one aggregate query
+    counts = db.session.execute(
+        select(
+            func.count().label('total'),
+            func.coalesce(func.sum(case((CheckIn.completed.is_(True), 1), else_=0)), 0).label('completed')
+        ).where(CheckIn.habit_id == habit_id)
+    ).one()
     
-    total_checkins = len(all_checkins)
-    total_completed = len(completed_checkins)
+    total_checkins = counts.total
+    total_completed = counts.completed
     success_rate = (total_completed / total_checkins * 100) if total_checkins > 0 else 0
     
     # Logic: Calculate days since start
     days_since_start = (datetime.now().date() - habit.start_date).days + 1
     
-    # Logic: Get check-ins by day of week
-    checkins_by_day = {}
-    for checkin in completed_checkins:
-        day_name = checkin.date.strftime('%A')
-        checkins_by_day[day_name] = checkins_by_day.get(day_name, 0) + 1
+    # Logic: Count completed check-ins per day of week in SQL (%w: 0 = Sunday)
+    weekday = func.strftime('%w', CheckIn.date)
+    day_counts = db.session.execute(
+        select(weekday, func.count())
+        .where(CheckIn.habit_id == habit_id, CheckIn.completed.is_(True))
+        .group_by(weekday)
+    ).all()
+    checkins_by_day = {WEEKDAY_NAMES[int(day)]: count for day, count in day_counts}
     
     return jsonify({
         'habit_id': habit_id,
         'habit_name': habit.name,
-        'start_date': habit.start_date.isoformat(),
+        'start_date': habit.start_date,
         'days_since_start': days_since_start,
         'total_checkins': total_checkins,
         'total_completed': total_completed,
         'success_rate': round(success_rate, 2),
         'checkins_by_day': checkins_by_day,
-        'last_updated': datetime.now().isoformat()
+        'last_updated': datetime.now()
     })
 
 @analytics_bp.route('/habits/<int:habit_id>/calendar', methods=['GET'])
 def get_habit_calendar(habit_id):
     """Get calendar view of check-ins for a specific habit"""
-    habit = Habit.query.get_or_404(habit_id)
+    # Logic: Only the name is needed, so skip loading the whole Habit
+    habit_name = db.session.scalar(select(Habit.name).where(Habit.id == habit_id))
+    if habit_name is None:
+        abort(404)
     
     # Logic: Get date range from query params or default to last 30 days
     days_back = request.args.get('days', 30, type=int)
     end_date = datetime.now().date()
     start_date = end_date - timedelta(days=days_back)
     
-    # Logic: Get all check-ins in date range
-    checkins = CheckIn.query.filter(
-        CheckIn.habit_id == habit_id,
-        CheckIn.date >= start_date,
-        CheckIn.date <= end_date
+    # Logic: Get just the calendar fields for check-ins in date range
+    rows = db.session.execute(
+        select(CheckIn.id, CheckIn.date, CheckIn.completed, CheckIn.notes).where(
+            CheckIn.habit_id == habit_id,
+            CheckIn.date >= start_date,
+            CheckIn.date <= end_date
+        )
     ).all()
     
-    # Logic: Create calendar data structure
+    # Logic: Create calendar data structure keyed by date; the JSON
+    # provider writes date keys and values as ISO strings
     calendar_data = {}
-    for checkin in checkins:
-        date_str = checkin.date.isoformat()
-        calendar_data[date_str] = {
-            'date': date_str,
-            'completed': checkin.completed,
-            'notes': checkin.notes or '',
-            'checkin_id': checkin.id
+    for checkin_id, checkin_date, completed, notes in rows:
+        calendar_data[checkin_date] = {
+            'date': checkin_date,
+            'completed': completed,
+            'notes': notes or '',
+            'checkin_id': checkin_id
         }
     
     return jsonify({
         'habit_id': habit_id,
-        'habit_name': habit.name,
+        'habit_name': habit_name,
         'date_range': {
-            'start_date': start_date.isoformat(),
-            'end_date': end_date.isoformat(),
+            'start_date': start_date,
+            'end_date': end_date,
             'days': days_back
         },
         'calendar_data': calendar_data
@@ -158,43 +209,59 @@ def get_habit_calendar(habit_id):
 @analytics_bp.route('/habits/analytics', methods=['GET'])
 def get_overall_analytics():
     """Get overall analytics across all habits"""
-    # Logic: Get all habits and their check-ins
-    habits = Habit.query.all()
+    cached = cache.get(ANALYTICS_CACHE_KEY)
+    if cached is None:
+        cached = (_overall_analytics(), datetime.now())
+        cache.set(ANALYTICS_CACHE_KEY, cached, timeout=ANALYTICS_CACHE_TIMEOUT)
+    payload, last_updated = cached
+    
+    # Logic: The ETag covers the data only, so polling clients get 304 until
+    # the numbers change, however often the payload is recomputed
+    return conditional_response(payload, last_modified=last_updated)
+
+def _overall_analytics():
+    """Aggregate habits and check-ins into the overall analytics payload"""
+    # Logic: Aggregate habits and check-ins per category in a single query
+    completed = case((CheckIn.completed.is_(True), 1), else_=0)
+    rows = db.session.execute(
+        select(
+            Habit.category,
+            func.count(distinct(Habit.id)).label('habit_count'),
+            func.count(CheckIn.id).label('checkin_count'),
+            func.coalesce(func.sum(completed), 0).label('completed_count'),
+            # Logic: Habits with at least one completed check-in (simplified streak check)
+            func.count(distinct(case((CheckIn.completed.is_(True), Habit.id)))).label('streak_count')
+        )
+        .outerjoin(CheckIn, CheckIn.habit_id == Habit.id)
+        .group_by(Habit.category)
+    ).all()
     
-    total_habits = len(habits)
+    total_habits = 0
     total_checkins = 0
     total_completed = 0
     habits_with_streaks = 0
     category_stats = {}
     
-    for habit in habits:
-        habit_checkins = CheckIn.query.filter_by(habit_id=habit.id).all()
-        habit_completed = CheckIn.query.filter_by(habit_id=habit.id, completed=True).all()
-        
-        total_checkins += len(habit_checkins)
-        total_completed += len(habit_completed)
-        
-        # Logic: Check if habit has any streak (simplified)
-        if len(habit_completed) > 0:
-            habits_with_streaks += 1
+    for row in rows:
+        total_habits += row.habit_count
+        total_checkins += row.checkin_count
+        total_completed += row.completed_count
+        habits_with_streaks += row.streak_count
         
         # Logic: Category statistics
-        category = habit.category
-        if category not in category_stats:
-            category_stats[category] = {'count': 0, 'completed': 0, 'total': 0}
-        
-        category_stats[category]['count'] += 1
-        category_stats[category]['completed'] += len(habit_completed)
-        category_stats[category]['total'] += len(habit_checkins)
+        category_stats[row.category] = {
+            'count': row.habit_count,
+            'completed': row.completed_count,
+            'total': row.checkin_count
+        }
     
     overall_success_rate = (total_completed / total_checkins * 100) if total_checkins > 0 else 0
     
-    return jsonify({
+    return {
         'total_habits': total_habits,
         'total_checkins': total_checkins,
         'total_completed': total_completed,
         'overall_success_rate': round(overall_success_rate, 2),
         'habits_with_streaks': habits_with_streaks,
-        'category_stats': category_stats,
-        'last_updated': datetime.now().isoformat()
-    })
+        'category_stats': category_stats
+    }
@@ -1,4 +1,6 @@
 from flask import Blueprint, request, jsonify
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from database import db
 from models import Category
 
@@ -6,8 +8,9 @@ categories_bp = Blueprint('categories', __name__)
 
 @categories_bp.route('/categories', methods=['GET'])
 def get_categories():
-    categories = Category.query.all()
-    return jsonify([category.to_dict() for category in categories])
+    # Logic: Read plain (id, name) rows; they serialize like Category.to_dict()
+    rows = db.session.execute(select(Category.id, Category.name)).all()
+    return jsonify([row._asdict() for row in rows])
 
 @categories_bp.route('/categories', methods=['POST'])
 def create_category():
@@ -30,6 +33,34 @@ def create_category():
         db.session.rollback()
         return jsonify({"error": str(e)}), 400
 
+@categories_bp.route('/categories/bulk', methods=['POST'])
+def bulk_create_categories():
+    """Create several categories with a single INSERT, skipping existing names"""
+    data = request.get_json()
+    
+    if not isinstance(data, list) or not data or not all(isinstance(name, str) and name for name in data):
+        return jsonify({"error": "Expected a non-empty list of category names"}), 400
+    
+    try:
+        # Logic: The unique name constraint turns duplicates into no-ops, and
+        # RETURNING reports only the rows that were actually created
+        created = db.session.execute(
+            sqlite_insert(Category)
+            .values([{'name': name} for name in dict.fromkeys(data)])
+            .on_conflict_do_nothing(index_elements=['name'])
+            .returning(Category.id, Category.name)
+        ).all()
+        db.session.commit()
+        
+        return jsonify({
+            'created': [row._asdict() for row in created],
+            'skipped': len(data) - len(created)
+        }), 201
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 400
+
 @categories_bp.route('/categories/<int:category_id>', methods=['GET'])
 def get_category(category_id):
     category = Category.query.get_or_404(category_id)
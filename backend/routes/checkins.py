@@ -1,52 +1,77 @@
-from flask import Blueprint, request, jsonify
-from datetime import datetime
+from flask import Blueprint, request, jsonify, abort
+from datetime import date
+from sqlalchemy import select, update, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from database import db
-from models import Habit, CheckIn
+from cache import cache
+from models import Habit, CheckIn, CHECKIN_COLUMNS, CHECKIN_KEYS
+from routes.analytics import invalidate_analytics
 
 # Create blueprint for check-in routes
 checkins_bp = Blueprint('checkins', __name__)
 
+# C-implemented YYYY-MM-DD parser, much cheaper than strptime
+_parse_date = date.fromisoformat
+
+# Per-habit check-in totals for pagination, dropped whenever check-ins are added or removed;
+# production shares the cache between workers, so every worker sees the invalidation
+CHECKIN_COUNT_TIMEOUT = 300
+
+def checkin_count_key(habit_id):
+    """Cache key for a habit's total check-in count"""
+    return f'checkin_count:{habit_id}'
+
 @checkins_bp.route('/habits/<int:habit_id>/checkin', methods=['POST'])
 def create_checkin(habit_id):
     """Add a check-in for a specific habit"""
-    habit = Habit.query.get_or_404(habit_id)
+    db.get_or_404(Habit, habit_id)
     data = request.get_json() or {}
     
     # Debug logging
     print(f"Creating check-in for habit {habit_id}")
     print(f"Received data: {data}")
     
-    # Logic: Use provided date or default to today
-    checkin_date_str = data.get('date', datetime.now().strftime('%Y-%m-%d'))
-    
     try:
-        checkin_date = datetime.strptime(checkin_date_str, '%Y-%m-%d').date()
+        # Logic: Use provided date or default to today
+        checkin_date = _parse_date(data['date']) if 'date' in data else date.today()
         
-        # Logic: Check if check-in already exists for this date
-        existing_checkin = CheckIn.query.filter_by(
-            habit_id=habit_id, 
-            date=checkin_date
-        ).first()
+        # Logic: Insert the check-in unless one already exists for this date;
+        # the unique (habit_id, date) constraint makes this a single statement
+        checkin = db.session.scalar(
+            sqlite_insert(CheckIn)
+            .values(
+                habit_id=habit_id,
+                date=checkin_date,
+                notes=data.get('notes', ''),
+                completed=data.get('completed', True)  # Default to completed
+            )
+            .on_conflict_do_nothing(index_elements=['habit_id', 'date'])
+            .returning(CheckIn)
+        )
         
-        if existing_checkin:
-            # Update existing check-in instead of creating a new one
-            existing_checkin.notes = data.get('notes', existing_checkin.notes)
-            existing_checkin.completed = data.get('completed', existing_checkin.completed)
+        if checkin is not None:
             db.session.commit()
-            return jsonify(existing_checkin.to_dict()), 200
+            cache.delete(checkin_count_key(habit_id))
+            invalidate_analytics()
+            return jsonify(checkin.to_dict()), 201
         
-        # Logic: Create new check-in with optional notes
-        checkin = CheckIn(
-            habit_id=habit_id,
-            date=checkin_date,
-            notes=data.get('notes', ''),
-            completed=data.get('completed', True)  # Default to completed
+        # Logic: Update existing check-in instead of creating a new one
+        changes = {field: data[field] for field in ('notes', 'completed') if field in data}
+        existing = select(CheckIn).where(CheckIn.habit_id == habit_id, CheckIn.date == checkin_date)
+        if changes:
+            existing = (
+                update(CheckIn)
+                .where(CheckIn.habit_id == habit_id, CheckIn.date == checkin_date)
+                .values(**changes)
+                .returning(CheckIn)
+            )
+        existing_checkin = db.session.scalar(
+            existing,
+            execution_options={'populate_existing': True}
         )
-        
-        db.session.add(checkin)
         db.session.commit()
-        
-        return jsonify(checkin.to_dict()), 201
+        invalidate_analytics()
+        return jsonify(existing_checkin.to_dict()), 200
         
     except ValueError:
         return jsonify({"error": "Invalid date format. Use YYYY-MM-DD"}), 400
@@ -54,62 +79,141 @@ def create_checkin(habit_id):
         db.session.rollback()
         return jsonify({"error": str(e)}), 400
 
+@checkins_bp.route('/habits/<int:habit_id>/checkins/bulk', methods=['POST'])
+def bulk_create_checkins(habit_id):
+    """Add several check-ins for a habit with a single multi-row INSERT"""
+    db.get_or_404(Habit, habit_id)
+    data = request.get_json()
+    
+    if not isinstance(data, list) or not data:
+        return jsonify({"error": "Expected a non-empty list of check-ins"}), 400
+    
+    try:
+        items = [
+            {
+                'habit_id': habit_id,
+                'date': _parse_date(item['date']),
+                'notes': item.get('notes', ''),
+                'completed': item.get('completed', True)
+            }
+            for item in data
+        ]
+        
+        # Logic: Dates that already have a check-in are skipped, not updated
+        inserted = db.session.execute(
+            sqlite_insert(CheckIn)
+            .on_conflict_do_nothing(index_elements=['habit_id', 'date'])
+            .returning(CheckIn.id),
+            items
+        ).all()
+        db.session.commit()
+        cache.delete(checkin_count_key(habit_id))
+        invalidate_analytics()
+        
+        return jsonify({
+            'inserted': len(inserted),
+            'skipped': len(items) - len(inserted)
+        }), 201
+        
+    except (KeyError, TypeError, ValueError):
+        db.session.rollback()
+        return jsonify({"error": "Each check-in needs a date in YYYY-MM-DD format"}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 400
+
 @checkins_bp.route('/habits/<int:habit_id>/checkins', methods=['GET'])
 def get_habit_checkins(habit_id):
     """Get all check-ins for a specific habit"""
-    habit = Habit.query.get_or_404(habit_id)
+    # Logic: Only the name is needed, so skip loading the whole Habit
+    habit_name = db.session.scalar(select(Habit.name).where(Habit.id == habit_id))
+    if habit_name is None:
+        abort(404)
     
     # Logic: Get query parameters for filtering
     limit = request.args.get('limit', type=int)
     offset = request.args.get('offset', 0, type=int)
     
-    # Logic: Base query for check-ins
-    query = CheckIn.query.filter_by(habit_id=habit_id).order_by(CheckIn.date.desc())
+    # Logic: Use the cached total if we have one, otherwise compute it in
+    # the same query as the page via COUNT(*) OVER ()
+    total_count = cache.get(checkin_count_key(habit_id))
+    columns = CHECKIN_COLUMNS
+    if total_count is None:
+        columns = (*CHECKIN_COLUMNS, func.count().over().label('total'))
+    
+    query = (
+        select(*columns)
+        .where(CheckIn.habit_id == habit_id)
+        .order_by(CheckIn.date.desc())
+    )
     
     # Logic: Apply pagination if requested
     if limit:
         query = query.limit(limit).offset(offset)
     
-    checkins = query.all()
+    rows = db.session.execute(query).all()
+    
+    if total_count is None:
+        if rows:
+            total_count = rows[0].total
+        elif limit and offset:
+            # Page past the end: no row carries the window total, so count directly
+            total_count = db.session.scalar(
+                select(func.count()).select_from(CheckIn).where(CheckIn.habit_id == habit_id)
+            )
+        else:
+            total_count = 0
+        cache.set(checkin_count_key(habit_id), total_count, timeout=CHECKIN_COUNT_TIMEOUT)
     
     return jsonify({
         'habit_id': habit_id,
-        'habit_name': habit.name,
-        'checkins': [checkin.to_dict() for checkin in checkins],
-        'total_count': CheckIn.query.filter_by(habit_id=habit_id).count()
+        'habit_name': habit_name,
+        'checkins': [dict(zip(CHECKIN_KEYS, row)) for row in rows],
+        'total_count': total_count
     })
 
 @checkins_bp.route('/checkins/<int:checkin_id>', methods=['PUT'])
 def update_checkin(checkin_id):
     """Update a specific check-in"""
-    checkin = CheckIn.query.get_or_404(checkin_id)
     data = request.get_json()
     
     if not data:
         return jsonify({"error": "No data provided"}), 400
     
     try:
-        # Logic: Allow updating notes and completion status
-        if 'notes' in data:
-            checkin.notes = data['notes']
-        if 'completed' in data:
-            checkin.completed = data['completed']
+        # Logic: Allow updating notes and completion status in a single UPDATE ... RETURNING
+        patch = {field: data[field] for field in ('notes', 'completed') if field in data}
+        if patch:
+            checkin = db.session.scalar(
+                update(CheckIn).where(CheckIn.id == checkin_id).values(**patch).returning(CheckIn)
+            )
+        else:
+            checkin = db.session.get(CheckIn, checkin_id)
         
+        # Serialize before commit expires the loaded attributes
+        result = checkin.to_dict() if checkin else None
         db.session.commit()
-        return jsonify(checkin.to_dict())
+        invalidate_analytics()
         
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 400
+    
+    if result is None:
+        abort(404)
+    return jsonify(result)
 
 @checkins_bp.route('/checkins/<int:checkin_id>', methods=['DELETE'])
 def delete_checkin(checkin_id):
     """Delete a specific check-in"""
     checkin = CheckIn.query.get_or_404(checkin_id)
+    habit_id = checkin.habit_id
     
     try:
         db.session.delete(checkin)
         db.session.commit()
+        cache.delete(checkin_count_key(habit_id))
+        invalidate_analytics()
         return jsonify({"message": "Check-in deleted successfully"}), 200
         
     except Exception as e:
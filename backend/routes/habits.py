@@ -1,16 +1,30 @@
-from flask import Blueprint, request, jsonify
-from datetime import datetime
+from flask import Blueprint, request, jsonify, abort
+from datetime import date
+from sqlalchemy import select, insert, update
 from database import db
-from models import Habit
+from cache import cache, conditional_response
+from models import Habit, HABIT_COLUMNS
+from routes.checkins import checkin_count_key
+from routes.analytics import invalidate_analytics
 
 # Create blueprint for habit routes
 habits_bp = Blueprint('habits', __name__)
 
+# C-implemented YYYY-MM-DD parser, much cheaper than strptime
+_parse_date = date.fromisoformat
+
+_REQUIRED_FIELDS = frozenset({'name', 'frequency', 'category'})
+
+def _has_required_fields(data):
+    """Check that a habit payload is a dict with non-empty name, frequency and category"""
+    return isinstance(data, dict) and _REQUIRED_FIELDS.issubset(data) and all(data[field] for field in _REQUIRED_FIELDS)
+
 @habits_bp.route('/habits', methods=['GET'])
 def get_habits():
     """Get all habits"""
-    habits = Habit.query.all()
-    return jsonify([habit.to_dict() for habit in habits])
+    # Read-only: fetch plain rows instead of building ORM instances
+    rows = db.session.execute(select(*HABIT_COLUMNS)).all()
+    return conditional_response([row._asdict() for row in rows])
 
 @habits_bp.route('/habits', methods=['POST'])
 def create_habit():
@@ -18,7 +32,7 @@ def create_habit():
     data = request.get_json()
     
     # Validate required fields
-    if not data or not data.get('name') or not data.get('frequency') or not data.get('category'):
+    if not _has_required_fields(data):
         return jsonify({"error": "Missing required fields: name, frequency, category"}), 400
     
     try:
@@ -27,11 +41,12 @@ def create_habit():
             description=data.get('description', ''),
             frequency=data['frequency'],
             category=data['category'],
-            start_date=datetime.strptime(data.get('start_date', datetime.now().strftime('%Y-%m-%d')), '%Y-%m-%d').date()
+            start_date=_parse_date(data['start_date']) if 'start_date' in data else date.today()
         )
         
         db.session.add(habit)
         db.session.commit()
+        invalidate_analytics()
         
         return jsonify(habit.to_dict()), 201
         
@@ -39,39 +54,78 @@ def create_habit():
         db.session.rollback()
         return jsonify({"error": str(e)}), 400
 
+@habits_bp.route('/habits/bulk', methods=['POST'])
+def bulk_create_habits():
+    """Create several habits with a single multi-row INSERT"""
+    data = request.get_json()
+    
+    if not isinstance(data, list) or not data:
+        return jsonify({"error": "Expected a non-empty list of habits"}), 400
+    
+    try:
+        items = []
+        for index, item in enumerate(data):
+            # Validate required fields
+            if not _has_required_fields(item):
+                return jsonify({"error": f"Habit {index}: missing required fields: name, frequency, category"}), 400
+            
+            items.append({
+                'name': item['name'],
+                'description': item.get('description', ''),
+                'frequency': item['frequency'],
+                'category': item['category'],
+                'start_date': _parse_date(item['start_date']) if 'start_date' in item else date.today()
+            })
+        
+        db.session.execute(insert(Habit), items)
+        db.session.commit()
+        invalidate_analytics()
+        
+        return jsonify({"inserted": len(items)}), 201
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 400
+
 @habits_bp.route('/habits/<int:habit_id>', methods=['GET'])
 def get_habit(habit_id):
     """Get a specific habit"""
     habit = Habit.query.get_or_404(habit_id)
-    return jsonify(habit.to_dict())
+    return conditional_response(habit.to_dict())
 
 @habits_bp.route('/habits/<int:habit_id>', methods=['PUT'])
 def update_habit(habit_id):
     """Update a specific habit"""
-    habit = Habit.query.get_or_404(habit_id)
     data = request.get_json()
     
     if not data:
         return jsonify({"error": "No data provided"}), 400
     
     try:
-        if 'name' in data:
-            habit.name = data['name']
-        if 'description' in data:
-            habit.description = data['description']
-        if 'frequency' in data:
-            habit.frequency = data['frequency']
-        if 'category' in data:
-            habit.category = data['category']
+        patch = {field: data[field] for field in ('name', 'description', 'frequency', 'category') if field in data}
         if 'start_date' in data:
-            habit.start_date = datetime.strptime(data['start_date'], '%Y-%m-%d').date()
+            patch['start_date'] = _parse_date(data['start_date'])
         
+        # Single UPDATE ... RETURNING instead of SELECT then UPDATE
+        if patch:
+            habit = db.session.scalar(
+                update(Habit).where(Habit.id == habit_id).values(**patch).returning(Habit)
+            )
+        else:
+            habit = db.session.get(Habit, habit_id)
+        
+        # Serialize before commit expires the loaded attributes
+        result = habit.to_dict() if habit else None
         db.session.commit()
-        return jsonify(habit.to_dict())
+        invalidate_analytics()
         
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 400
+    
+    if result is None:
+        abort(404)
+    return jsonify(result)
 
 @habits_bp.route('/habits/<int:habit_id>', methods=['DELETE'])
 def delete_habit(habit_id):
@@ -81,6 +135,9 @@ def delete_habit(habit_id):
     try:
         db.session.delete(habit)
         db.session.commit()
+        # SQLite can reuse the id, so drop the cached check-in total with the habit
+        cache.delete(checkin_count_key(habit_id))
+        invalidate_analytics()
         return jsonify({"message": "Habit deleted successfully"}), 200
         
     except Exception as e:
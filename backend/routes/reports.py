@@ -2,16 +2,24 @@
 Reports routes for generating PDF reports
 """
 
-from flask import Blueprint, request, jsonify, send_file
-from datetime import datetime, timedelta
+from flask import Blueprint, request, jsonify, send_file, current_app
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from sqlalchemy import select, func, case
 from database import db
-from models import Habit, CheckIn
-from services.pdf_service import PDFReportService
-from io import BytesIO
+from models import Habit, CheckIn, HABIT_COLUMNS, CHECKIN_COLUMNS, CHECKIN_KEYS, habit_row_to_dict, checkin_row_to_dict
+from routes.analytics import SQLITE_HAS_WINDOW_FUNCTIONS
+from tempfile import SpooledTemporaryFile
 
 # Create blueprint for reports routes
 reports_bp = Blueprint('reports', __name__)
 
+# C-implemented YYYY-MM-DD parser, much cheaper than strptime
+_parse_date = date.fromisoformat
+
+# Reports up to this size stay in memory, larger ones spill to a temp file
+PDF_SPOOL_MAX_SIZE = 2 * 1024 * 1024
+
 @reports_bp.route('/habits/pdf', methods=['GET'])
 def generate_habit_pdf():
     """Generate and return a PDF report of habit progress"""
@@ -24,35 +32,56 @@ def generate_habit_pdf():
         date_range = None
         if start_date_str and end_date_str:
             try:
-                start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
-                end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+                start_date = _parse_date(start_date_str)
+                end_date = _parse_date(end_date_str)
                 date_range = (start_date_str, end_date_str)
             except ValueError:
                 return jsonify({"error": "Invalid date format. Use YYYY-MM-DD"}), 400
         
         # Get all habits
-        habits = Habit.query.all()
-        habits_data = [habit.to_dict() for habit in habits]
-        
-        # Get check-ins
-        checkins_query = CheckIn.query
-        if date_range:
-            checkins_query = checkins_query.filter(
-                CheckIn.date >= start_date,
-                CheckIn.date <= end_date
-            )
-        
-        checkins = checkins_query.all()
-        checkins_data = [checkin.to_dict() for checkin in checkins]
+        habits = db.session.execute(select(*HABIT_COLUMNS)).all()
+        habits_data = list(map(habit_row_to_dict, habits))
+        
+        max_checkins_per_habit = current_app.config['REPORT_MAX_CHECKINS_PER_HABIT']
+        date_filter = (CheckIn.date >= start_date, CheckIn.date <= end_date) if date_range else ()
+        
+        # Logic: Per-habit counts give exact totals and tell whether any
+        # habit has more check-ins than the report keeps
+        habit_counts = db.session.execute(
+            select(
+                func.count().label('total'),
+                func.coalesce(func.sum(case((CheckIn.completed.is_(True), 1), else_=0)), 0).label('completed')
+            ).where(*date_filter).group_by(CheckIn.habit_id)
+        ).all()
+        total_checkins = sum(row.total for row in habit_counts)
+        total_completed = sum(row.completed for row in habit_counts)
+        truncated = any(row.total > max_checkins_per_habit for row in habit_counts)
+        
+        # Get check-ins, newest first so the report can slice instead of sorting
+        if SQLITE_HAS_WINDOW_FUNCTIONS:
+            # Logic: Keep only each habit's most recent check-ins in SQL, so
+            # parsing and grouping scale with what the PDF shows
+            ranked = select(
+                *CHECKIN_COLUMNS,
+                func.row_number().over(
+                    partition_by=CheckIn.habit_id, order_by=CheckIn.date.desc()
+                ).label('rank')
+            ).where(*date_filter).subquery()
+            checkins_query = select(*(ranked.c[key] for key in CHECKIN_KEYS)).where(
+                ranked.c.rank <= max_checkins_per_habit
+            ).order_by(ranked.c.date.desc())
+        else:
+            checkins_query = select(*CHECKIN_COLUMNS).where(*date_filter).order_by(CheckIn.date.desc())
+        
+        checkins = db.session.execute(checkins_query).all()
+        checkins_data = list(map(checkin_row_to_dict, checkins))
         
         # Calculate analytics data
         total_habits = len(habits_data)
-        total_checkins = len(checkins_data)
-        total_completed = len([c for c in checkins_data if c['completed']])
         overall_success_rate = round((total_completed / total_checkins * 100), 1) if total_checkins > 0 else 0
         
         # Calculate current streak (simplified - across all habits)
-        current_streak = calculate_overall_current_streak(checkins_data)
+        current_streak = _current_streak({c['date'] for c in checkins_data if c['completed']})
         
         analytics_data = {
             'total_habits': total_habits,
@@ -62,27 +91,40 @@ def generate_habit_pdf():
             'current_streak': current_streak
         }
         
-        # Generate PDF
-        pdf_service = PDFReportService()
-        pdf_buffer = pdf_service.generate_habit_report(
+        # Generate PDF (imported here so reportlab only loads once a report is requested)
+        from services.pdf_service import pdf_report_service
+        pdf_buffer = pdf_report_service.generate_habit_report(
             habits_data, 
             checkins_data, 
             analytics_data, 
-            date_range
+            date_range,
+            output=SpooledTemporaryFile(max_size=PDF_SPOOL_MAX_SIZE),
+            max_habits=current_app.config['REPORT_MAX_HABITS'],
+            max_checkins_per_habit=max_checkins_per_habit,
+            already_sorted_desc=True,
+            truncated=truncated
         )
         
         # Prepare filename
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = f'habit_hero_report_{timestamp}.pdf'
         
-        # Return PDF file
+        # Logic: send_file only sizes BytesIO itself, so measure the spooled file
+        pdf_size = pdf_buffer.seek(0, 2)
         pdf_buffer.seek(0)
-        return send_file(
+        
+        # Return PDF file (send_file closes the spooled file once sent)
+        response = send_file(
             pdf_buffer,
             as_attachment=True,
             download_name=filename,
             mimetype='application/pdf'
         )
+        response.content_length = pdf_size
+        # Logic: Lets clients tell users the report left out habits or older check-ins
+        truncated = truncated or len(habits_data) > current_app.config['REPORT_MAX_HABITS']
+        response.headers['X-Report-Truncated'] = 'true' if truncated else 'false'
+        return response
         
     except Exception as e:
         print(f"Error generating PDF report: {str(e)}")
@@ -101,59 +143,70 @@ def get_report_analytics():
         end_date = None
         if start_date_str and end_date_str:
             try:
-                start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
-                end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+                start_date = _parse_date(start_date_str)
+                end_date = _parse_date(end_date_str)
             except ValueError:
                 return jsonify({"error": "Invalid date format. Use YYYY-MM-DD"}), 400
         
-        # Get habits
-        habits = Habit.query.all()
-        habits_data = [habit.to_dict() for habit in habits]
+        # Get habits (only the columns the preview shows)
+        habits = db.session.execute(
+            select(Habit.id, Habit.name, Habit.category, Habit.frequency)
+        ).all()
         
-        # Get check-ins
-        checkins_query = CheckIn.query
+        # Get check-ins (only what the counts and streaks read)
+        checkins_query = select(CheckIn.habit_id, CheckIn.date, CheckIn.completed)
         if start_date and end_date:
-            checkins_query = checkins_query.filter(
+            checkins_query = checkins_query.where(
                 CheckIn.date >= start_date,
                 CheckIn.date <= end_date
             )
         
-        checkins = checkins_query.all()
-        checkins_data = [checkin.to_dict() for checkin in checkins]
+        checkins = db.session.execute(checkins_query).all()
+        
+        # Group check-ins by habit in one pass, keeping completed dates apart
+        # so the totals, per-habit counts and streaks don't re-filter
+        checkins_by_habit = defaultdict(lambda: {'all': 0, 'completed': []})
+        completed_dates = set()
+        for habit_id, checkin_date, completed in checkins:
+            habit_group = checkins_by_habit[habit_id]
+            habit_group['all'] += 1
+            if completed:
+                date_str = checkin_date.isoformat()
+                habit_group['completed'].append(date_str)
+                completed_dates.add(date_str)
         
         # Calculate analytics
-        total_habits = len(habits_data)
-        total_checkins = len(checkins_data)
-        total_completed = len([c for c in checkins_data if c['completed']])
+        total_habits = len(habits)
+        total_checkins = len(checkins)
+        total_completed = sum(len(group['completed']) for group in checkins_by_habit.values())
         overall_success_rate = round((total_completed / total_checkins * 100), 1) if total_checkins > 0 else 0
-        current_streak = calculate_overall_current_streak(checkins_data)
+        current_streak = _current_streak(completed_dates)
         
         # Category breakdown
         categories = {}
-        for habit in habits_data:
-            category = habit.get('category', 'Uncategorized')
+        for habit in habits:
+            category = habit.category
             categories[category] = categories.get(category, 0) + 1
         
         # Habit performance summary
         habit_performance = []
-        for habit in habits_data:
-            habit_id = habit['id']
-            habit_checkins = [c for c in checkins_data if c['habit_id'] == habit_id]
+        for habit in habits:
+            habit_group = checkins_by_habit.get(habit.id)
             
-            if habit_checkins:
-                total_habit_checkins = len(habit_checkins)
-                completed_habit_checkins = len([c for c in habit_checkins if c['completed']])
+            if habit_group:
+                total_habit_checkins = habit_group['all']
+                completed_habit_checkins = len(habit_group['completed'])
                 success_rate = round((completed_habit_checkins / total_habit_checkins * 100), 1)
-                current_habit_streak = calculate_habit_current_streak(habit_checkins)
+                current_habit_streak = _current_streak(set(habit_group['completed']))
             else:
                 success_rate = 0
                 current_habit_streak = 0
             
             habit_performance.append({
-                'id': habit['id'],
-                'name': habit['name'],
-                'category': habit['category'],
-                'frequency': habit['frequency'],
+                'id': habit.id,
+                'name': habit.name,
+                'category': habit.category,
+                'frequency': habit.frequency,
                 'success_rate': success_rate,
                 'current_streak': current_habit_streak
             })
@@ -176,57 +229,15 @@ def get_report_analytics():
         print(f"Error getting report analytics: {str(e)}")
         return jsonify({"error": "Failed to get analytics data"}), 500
 
-def calculate_overall_current_streak(checkins_data):
-    """Calculate overall current streak across all habits"""
-    if not checkins_data:
-        return 0
-    
-    # Get all completed check-ins, sorted by date
-    completed_checkins = [c for c in checkins_data if c['completed']]
-    if not completed_checkins:
-        return 0
-    
-    # Sort by date (most recent first)
-    sorted_checkins = sorted(completed_checkins, key=lambda x: x['date'], reverse=True)
-    
-    today = datetime.now().date()
-    current_date = today
-    streak_count = 0
-    
-    # Check consecutive days backwards from today
-    for checkin in sorted_checkins:
-        checkin_date = datetime.strptime(checkin['date'], '%Y-%m-%d').date()
-        if checkin_date == current_date:
-            streak_count += 1
-            current_date -= timedelta(days=1)
-        elif checkin_date < current_date:
-            break
-    
-    return streak_count
-
-def calculate_habit_current_streak(checkins_data):
-    """Calculate current streak for a specific habit"""
-    if not checkins_data:
-        return 0
-    
-    # Filter completed check-ins and sort by date
-    completed_checkins = [c for c in checkins_data if c['completed']]
-    if not completed_checkins:
-        return 0
-    
-    sorted_checkins = sorted(completed_checkins, key=lambda x: x['date'], reverse=True)
-    
-    today = datetime.now().date()
-    current_date = today
+def _current_streak(date_strs):
+    """Count consecutive days back from today in a set of YYYY-MM-DD strings"""
+    current_date = datetime.now().date()
     streak_count = 0
     
-    # Check consecutive days backwards from today
-    for checkin in sorted_checkins:
-        checkin_date = datetime.strptime(checkin['date'], '%Y-%m-%d').date()
-        if checkin_date == current_date:
-            streak_count += 1
-            current_date -= timedelta(days=1)
-        elif checkin_date < current_date:
-            break
+    # Logic: Walk back from today with set lookups - no sort and no parsing,
+    # only the days inside the streak are formatted
+    while current_date.isoformat() in date_strs:
+        streak_count += 1
+        current_date -= timedelta(days=1)
     
     return streak_count
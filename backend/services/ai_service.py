@@ -4,43 +4,243 @@ Provides intelligent habit recommendations based on user's existing habits and g
 """
 
 import os
+import re
 import time
-from google import genai
-from google.genai import types
-from typing import List, Dict, Any
+import random
+import asyncio
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+from difflib import SequenceMatcher
+from types import MappingProxyType
+from typing import List, Dict, Any, Optional, Tuple
 import json
 import logging
-import httpx
+import orjson
+
+# Decodes one JSON value from a position in a partially streamed response
+_JSON_DECODER = json.JSONDecoder()
+
+# Keep-alive pool shared by every Gemini call made through the service's client
+# (httpx.Limits arguments; httpx itself is imported with the Gemini SDK)
+HTTP_POOL_LIMITS = {'max_connections': 100, 'max_keepalive_connections': 50}
+
+# Upper bound on a single retry wait, Retry-After included
+MAX_RETRY_WAIT = 30
+
+# Outermost JSON array / object in a model response, compiled once
+_JSON_ARRAY_RE = re.compile(r'\[.*\]', re.DOTALL)
+_JSON_OBJECT_RE = re.compile(r'\{.*\}', re.DOTALL)
+
+# Suggestions whose normalized name is at least this similar to an existing
+# habit are treated as duplicates
+DUPLICATE_NAME_RATIO = 0.85
+_NON_WORD_RE = re.compile(r'[^a-z0-9]+')
+
+
+def _normalize_habit_name(name: str) -> str:
+    """Lowercase a habit name and collapse punctuation/whitespace"""
+    return _NON_WORD_RE.sub(' ', name.lower()).strip()
+
+
+class ResponseCache:
+    """Thread-safe LRU cache for Gemini response text with a per-entry TTL"""
+    
+    def __init__(self, maxsize: int = 1000, ttl: float = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def make_key(model_name: str, prompt: str) -> str:
+        """Hash the model and full prompt; the prompt already embeds habits and goals"""
+        return hashlib.sha256(f"{model_name}\n{prompt}".encode()).hexdigest()
+    
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+    
+    def set(self, key: str, value) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
 
 class AIService:
+    # Prompt instructions are kept ahead of any per-user data so every request
+    # shares the same prefix, which is what Gemini's prompt caching reuses
+    _USER_CONTEXT_DELIMITER = "\n---USER CONTEXT---\n"
+    
+    _SUGGESTION_PREFIX = """
+You are a habit formation expert and personal development coach. Based on the user's existing habits, suggest 1 new habit that would complement their current routine and help them build a more balanced lifestyle. The user's existing habits and goals are given after the USER CONTEXT line below.
+
+Please suggest 1 new habit that:
+1. Complements their existing habits (don't duplicate)
+2. Fills gaps in their routine (e.g., if they only have health habits, suggest personal development)
+3. Is realistic and achievable
+4. Covers an important life area (health, personal, productivity, relationships, learning)
+
+For each suggestion, provide:
+- A catchy, motivating name
+- A clear, actionable description
+- An appropriate category (Health, Personal, Productivity, Learning, Relationships, Finance, etc.)
+- Frequency (daily or weekly)
+- A short reason why this habit would be beneficial for them
+
+Make the suggestions specific, actionable, and personalized to their current habit profile.
+"""
+    
+    _ANALYSIS_PREFIX = """
+You are a habit analyst. Based on the user's habit data, provide insights and recommendations. The habit data is given after the USER CONTEXT line below.
+
+Please analyze their habits and provide:
+1. Overall performance assessment
+2. Strengths (what they're doing well)
+3. Areas for improvement
+4. Specific recommendations for better habit formation
+
+Give a performance score between 1 and 10, about three strengths, two improvements and three recommendations.
+"""
+    
+    # Read-only fallbacks, built once instead of on every failed request
+    _FALLBACK_SUGGESTIONS = (
+        MappingProxyType({
+            'name': 'Morning Meditation',
+            'description': 'Spend 10 minutes meditating or practicing mindfulness each morning',
+            'category': 'Personal',
+            'frequency': 'daily',
+            'reason': 'Helps reduce stress and improve focus throughout the day'
+        }),
+    )
+    
+    _FALLBACK_ANALYSIS = MappingProxyType({
+        "performance_score": 7,
+        "strengths": (
+            "Consistent habit tracking",
+            "Diverse habit categories",
+            "Good habit variety"
+        ),
+        "improvements": (
+            "Increase completion rates",
+            "Add more specific goals",
+            "Improve habit timing"
+        ),
+        "recommendations": (
+            "Set specific, measurable goals for each habit",
+            "Try habit stacking - link new habits to existing ones",
+            "Focus on consistency over perfection"
+        )
+    })
+    
     def __init__(self):
         """Initialize the AI service with Gemini API"""
         api_key = os.environ.get('GEMINI_API_KEY')
         if not api_key:
             raise ValueError("GEMINI_API_KEY environment variable is required")
         
-        # Configure logging
-        logging.basicConfig(level=logging.INFO)
+        # Logging is configured by the app bootstrap, not per service instance
         self.logger = logging.getLogger(__name__)
         
         # Initialize the new Gemini client
         try:
-            self.client = genai.Client(api_key=api_key)
+            # Imported here rather than at module level: the SDK pulls in pydantic
+            # models, httpx and friends, which apps that never hit the AI routes skip
+            import httpx
+            from google import genai
+            from google.genai import errors as genai_errors
+            from google.genai import types
+            
+            self._api_error = genai_errors.APIError
+            self._http_status_error = httpx.HTTPStatusError
+            self._timeout_error = httpx.TimeoutException
+            self._suggestion_config, self._analysis_config = self._build_generation_configs(types)
+            
+            # One client (and so one connection pool) per service instance;
+            # use get_ai_service() to share it across the app
+            self.client = genai.Client(
+                api_key=api_key,
+                http_options=types.HttpOptions(
+                    client_args={'limits': httpx.Limits(**HTTP_POOL_LIMITS)},
+                    async_client_args={'limits': httpx.Limits(**HTTP_POOL_LIMITS)}
+                )
+            )
             self.model_name = 'gemini-2.5-flash'
             self.max_retries = 3
             self.retry_delay = 2  # seconds
-            self.logger.info(f"AI service initialized successfully with {self.model_name}")
+            # Identical prompts within an hour reuse the previous answer
+            self.response_cache = ResponseCache(maxsize=1000, ttl=3600)
+            self.logger.info("AI service initialized successfully with %s", self.model_name)
         except Exception as e:
-            self.logger.error(f"Failed to initialize Gemini client: {str(e)}")
+            self.logger.error("Failed to initialize Gemini client: %s", e)
             raise ValueError(f"Could not initialize Gemini client. Error: {str(e)}")
     
-    def generate_habit_suggestions(self, existing_habits: List[Dict[str, Any]], user_goals: str = None) -> List[Dict[str, str]]:
+    @staticmethod
+    def _build_generation_configs(types) -> Tuple[Any, Any]:
+        """Structured-output configs for suggestions and analysis"""
+        # Structured output replaces the JSON examples that used to be in the prompts:
+        # the model emits compact JSON only, and the output cap bounds latency
+        suggestion_config = types.GenerateContentConfig(
+            response_mime_type='application/json',
+            response_schema=types.Schema(
+                type='ARRAY',
+                items=types.Schema(
+                    type='OBJECT',
+                    properties={
+                        'name': types.Schema(type='STRING'),
+                        'description': types.Schema(type='STRING'),
+                        'category': types.Schema(type='STRING'),
+                        'frequency': types.Schema(type='STRING', enum=['daily', 'weekly']),
+                        'reason': types.Schema(type='STRING')
+                    },
+                    required=['name', 'description', 'category', 'frequency', 'reason'],
+                    property_ordering=['name', 'description', 'category', 'frequency', 'reason']
+                ),
+                max_items=1
+            ),
+            temperature=0.7,
+            max_output_tokens=512,
+            # Thinking tokens count against max_output_tokens and add latency
+            thinking_config=types.ThinkingConfig(thinking_budget=0)
+        )
+        
+        analysis_config = types.GenerateContentConfig(
+            response_mime_type='application/json',
+            response_schema=types.Schema(
+                type='OBJECT',
+                properties={
+                    'performance_score': types.Schema(type='INTEGER', minimum=1, maximum=10),
+                    'strengths': types.Schema(type='ARRAY', items=types.Schema(type='STRING')),
+                    'improvements': types.Schema(type='ARRAY', items=types.Schema(type='STRING')),
+                    'recommendations': types.Schema(type='ARRAY', items=types.Schema(type='STRING'))
+                },
+                required=['performance_score', 'strengths', 'improvements', 'recommendations'],
+                property_ordering=['performance_score', 'strengths', 'improvements', 'recommendations']
+            ),
+            temperature=0.7,
+            max_output_tokens=512,
+            thinking_config=types.ThinkingConfig(thinking_budget=0)
+        )
+        return suggestion_config, analysis_config
+    
+    def generate_habit_suggestions(self, existing_habits: List[Dict[str, Any]], user_goals: str = None,
+                                   use_cache: bool = True) -> List[Dict[str, str]]:
         """
         Generate AI-powered habit suggestions based on existing habits and user goals
         
         Args:
             existing_habits: List of existing habit dictionaries
             user_goals: Optional user goals or preferences
+            use_cache: False to always call Gemini, e.g. for health probes
             
         Returns:
             List of suggested habits with name, description, category, and frequency
@@ -52,20 +252,113 @@ class AIService:
             # Create the prompt for Gemini
             prompt = self._create_suggestion_prompt(habits_context, user_goals)
             
-            # Generate response from Gemini with retry logic
-            response = self._generate_with_retry(prompt)
+            # Stream the response from Gemini with retry logic (or reuse a cached one)
+            suggestions = self._generate_cached(
+                prompt,
+                self._parse_ai_response,
+                lambda p: self._stream_first_suggestion(p, config=self._suggestion_config),
+                use_cache=use_cache
+            )
+            
+            # Return the suggestions, minus near-duplicates of existing habits
+            suggestions = self._drop_duplicate_suggestions(
+                suggestions or self._get_fallback_suggestions(), existing_habits
+            )
             
-            # Parse and return suggestions
-            suggestions = self._parse_ai_response(response.text)
+            self.logger.info("Generated %d habit suggestions", len(suggestions))
+            return suggestions
+            
+        except Exception as e:
+            self.logger.error("Error generating habit suggestions: %s", e)
+            return self._get_fallback_suggestions()
+    
+    async def agenerate_habit_suggestions(self, existing_habits: List[Dict[str, Any]], user_goals: str = None) -> List[Dict[str, str]]:
+        """Async version of generate_habit_suggestions"""
+        try:
+            habits_context = self._prepare_habits_context(existing_habits)
+            prompt = self._create_suggestion_prompt(habits_context, user_goals)
+            suggestions = await self._agenerate_cached(prompt, self._parse_ai_response, self._suggestion_config)
+            suggestions = self._drop_duplicate_suggestions(
+                suggestions or self._get_fallback_suggestions(), existing_habits
+            )
             
-            self.logger.info(f"Generated {len(suggestions)} habit suggestions")
+            self.logger.info("Generated %d habit suggestions", len(suggestions))
             return suggestions
             
         except Exception as e:
-            self.logger.error(f"Error generating habit suggestions: {str(e)}")
+            self.logger.error("Error generating habit suggestions: %s", e)
             return self._get_fallback_suggestions()
     
-    def _generate_with_retry(self, prompt: str, retries: int = None, delay: int = None):
+    async def agenerate_batch(
+        self,
+        users: List[Tuple[List[Dict[str, Any]], Optional[str]]],
+        max_concurrency: int = 8
+    ) -> List[List[Dict[str, str]]]:
+        """
+        Generate suggestions for several users concurrently
+        
+        Args:
+            users: List of (existing_habits, user_goals) pairs
+            max_concurrency: Most Gemini calls allowed in flight at once, to stay under rate limits
+            
+        Returns:
+            One suggestions list per user, in input order (failures get the fallback)
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def generate(existing_habits, user_goals):
+            async with semaphore:
+                return await self.agenerate_habit_suggestions(existing_habits, user_goals)
+        
+        return await asyncio.gather(*(generate(habits, goals) for habits, goals in users))
+    
+    def _generate_cached(self, prompt: str, parse, generate=None, config=None, use_cache=True):
+        """
+        Return the parsed response for a prompt, calling Gemini only on a cache miss
+        
+        Only responses that parse are cached; failures propagate and unparseable
+        text (such as a stream cut off mid-suggestion) parses to None, so callers
+        still fall back without poisoning the cache.
+        
+        Args:
+            prompt: The prompt to send to Gemini
+            parse: Callable turning response text into a result, or None if it is unusable
+            generate: Callable producing the text for a prompt (default: _generate_with_retry)
+            config: Optional GenerateContentConfig for the default generator
+            use_cache: False to skip the cache entirely, neither reading nor storing
+        """
+        if generate is None:
+            generate = lambda p: self._generate_with_retry(p, config=config).text
+        if not use_cache:
+            return parse(generate(prompt))
+        
+        key = ResponseCache.make_key(self.model_name, prompt)
+        response_text = self.response_cache.get(key)
+        if response_text is not None:
+            self.logger.info("AI response served from cache")
+            return parse(response_text)
+        
+        return self._cache_parsed(key, generate(prompt), parse)
+    
+    async def _agenerate_cached(self, prompt: str, parse, config=None):
+        """Async version of _generate_cached, sharing the same response cache"""
+        key = ResponseCache.make_key(self.model_name, prompt)
+        response_text = self.response_cache.get(key)
+        if response_text is not None:
+            self.logger.info("AI response served from cache")
+            return parse(response_text)
+        
+        response_text = (await self._agenerate_with_retry(prompt, config=config)).text
+        return self._cache_parsed(key, response_text, parse)
+    
+    def _cache_parsed(self, key: str, response_text: str, parse):
+        """Parse fresh response text, caching it only if it parsed"""
+        result = parse(response_text)
+        if result is not None:
+            self.response_cache.set(key, response_text)
+        return result
+    
+    def _generate_with_retry(self, prompt: str, retries: int = None, delay: int = None, config=None):
         """
         Generate content with retry logic for handling API failures
         
@@ -73,6 +366,7 @@ class AIService:
             prompt: The prompt to send to Gemini
             retries: Number of retry attempts (default: self.max_retries)
             delay: Delay between retries in seconds (default: self.retry_delay)
+            config: Optional GenerateContentConfig (structured output, limits)
             
         Returns:
             Response from Gemini API
@@ -85,67 +379,175 @@ class AIService:
         
         for attempt in range(retries):
             try:
-                self.logger.info(f"AI request attempt {attempt + 1}/{retries}")
+                self.logger.info("AI request attempt %d/%d", attempt + 1, retries)
                 
                 response = self.client.models.generate_content(
                     model=self.model_name,
-                    contents=prompt
+                    contents=prompt,
+                    config=config
                 )
                 
-                self.logger.info(f"AI request successful on attempt {attempt + 1}")
+                self.logger.info("AI request successful on attempt %d", attempt + 1)
                 return response
                 
-            except httpx.HTTPStatusError as e:
-                # Handle 503 Service Unavailable and other HTTP errors
-                if e.response.status_code == 503:
-                    self.logger.warning(f"Service unavailable (503) on attempt {attempt + 1}/{retries}")
-                elif e.response.status_code == 429:
-                    self.logger.warning(f"Rate limit exceeded (429) on attempt {attempt + 1}/{retries}")
-                else:
-                    self.logger.error(f"HTTP error {e.response.status_code} on attempt {attempt + 1}/{retries}")
+            except Exception as e:
+                time.sleep(self._retry_wait(e, attempt, retries, delay))
+    
+    def _stream_first_suggestion(self, prompt: str, retries: int = None, delay: int = None, config=None) -> str:
+        """
+        Stream a suggestion response and stop reading once the first habit is complete
+        
+        Only one suggestion is kept, so there is no need to wait for the rest of
+        the array or any trailing commentary the model adds.
+        
+        Returns:
+            A JSON array string holding the first suggestion, or the full
+            response text if no complete object was found
+        """
+        retries = retries or self.max_retries
+        delay = delay or self.retry_delay
+        
+        for attempt in range(retries):
+            try:
+                self.logger.info("AI streaming request attempt %d/%d", attempt + 1, retries)
+                stream = self.client.models.generate_content_stream(
+                    model=self.model_name,
+                    contents=prompt,
+                    config=config
+                )
+                return self._read_first_suggestion(stream)
+                
+            except Exception as e:
+                time.sleep(self._retry_wait(e, attempt, retries, delay))
+    
+    def _read_first_suggestion(self, stream) -> str:
+        """Accumulate streamed chunks until the first object of the JSON array decodes"""
+        text = ''
+        object_start = -1
+        
+        try:
+            for chunk in stream:
+                piece = chunk.text or ''
+                text += piece
+                
+                if object_start < 0:
+                    array_start = text.find('[')
+                    if array_start >= 0:
+                        object_start = text.find('{', array_start)
+                
+                # Only a chunk with a closing brace can complete the object
+                if object_start >= 0 and '}' in piece:
+                    try:
+                        _, object_end = _JSON_DECODER.raw_decode(text, object_start)
+                    except ValueError:
+                        continue
+                    return f"[{text[object_start:object_end]}]"
+        finally:
+            # Closing the generator closes the underlying HTTP stream early
+            stream.close()
+        
+        return text
+    
+    async def _agenerate_with_retry(self, prompt: str, retries: int = None, delay: int = None, config=None):
+        """
+        Async version of _generate_with_retry using the client's aio API
+        
+        Waiting between retries awaits instead of blocking the thread, so
+        several requests can be in flight on one event loop. The genai async
+        HTTP client is tied to the loop it first ran on, so drive all calls
+        from one long-lived loop rather than a fresh asyncio.run() per call.
+        """
+        retries = retries or self.max_retries
+        delay = delay or self.retry_delay
+        
+        for attempt in range(retries):
+            try:
+                self.logger.info("AI request attempt %d/%d", attempt + 1, retries)
+                
+                response = await self.client.aio.models.generate_content(
+                    model=self.model_name,
+                    contents=prompt,
+                    config=config
+                )
                 
-                # Retry if not the last attempt
-                if attempt < retries - 1:
-                    wait_time = delay * (2 ** attempt)  # Exponential backoff
-                    self.logger.info(f"Retrying in {wait_time} seconds...")
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    self.logger.error(f"All {retries} attempts failed")
-                    raise e
-                    
-            except httpx.TimeoutException as e:
-                self.logger.warning(f"Request timeout on attempt {attempt + 1}/{retries}")
+                self.logger.info("AI request successful on attempt %d", attempt + 1)
+                return response
                 
-                if attempt < retries - 1:
-                    wait_time = delay * (2 ** attempt)
-                    self.logger.info(f"Retrying in {wait_time} seconds...")
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    self.logger.error(f"All {retries} attempts failed due to timeout")
-                    raise e
-                    
             except Exception as e:
-                # For other exceptions, log and raise immediately
-                self.logger.error(f"Unexpected error on attempt {attempt + 1}: {str(e)}")
-                raise e
+                await asyncio.sleep(self._retry_wait(e, attempt, retries, delay))
+    
+    def _error_status_code(self, error: Exception):
+        """HTTP status of a failed API call, or None if it was not an HTTP error"""
+        if isinstance(error, self._api_error):
+            return error.code
+        if isinstance(error, self._http_status_error):
+            return error.response.status_code
+        return None
+    
+    def _retry_wait(self, error: Exception, attempt: int, retries: int, delay: int) -> float:
+        """
+        Decide how to handle a failed attempt
+        
+        Returns:
+            Seconds to wait before the next attempt
+            
+        Raises:
+            The original error if it is not retryable or this was the last attempt
+        """
+        status_code = self._error_status_code(error)
+        
+        if isinstance(error, self._timeout_error):
+            self.logger.warning("Request timeout on attempt %d/%d", attempt + 1, retries)
+        elif status_code == 503:
+            # Handle 503 Service Unavailable and other HTTP errors
+            self.logger.warning("Service unavailable (503) on attempt %d/%d", attempt + 1, retries)
+        elif status_code == 429:
+            self.logger.warning("Rate limit exceeded (429) on attempt %d/%d", attempt + 1, retries)
+        elif status_code is not None:
+            self.logger.error("HTTP error %s on attempt %d/%d", status_code, attempt + 1, retries)
+        else:
+            # For other exceptions, log and raise immediately
+            self.logger.error("Unexpected error on attempt %d: %s", attempt + 1, error)
+            raise error
+        
+        # Retry if not the last attempt
+        if attempt >= retries - 1:
+            self.logger.error("All %d attempts failed", retries)
+            raise error
+        
+        # Exponential backoff with full jitter, so concurrent callers that hit
+        # the same rate limit do not all retry in lockstep
+        wait_time = random.uniform(0, delay * (2 ** attempt))
+        if status_code in (429, 503):
+            retry_after = self._retry_after(error)
+            if retry_after is not None:
+                wait_time = max(retry_after, wait_time)
+        wait_time = min(wait_time, MAX_RETRY_WAIT)
+        self.logger.info("Retrying in %.2f seconds...", wait_time)
+        return wait_time
+    
+    @staticmethod
+    def _retry_after(error: Exception) -> Optional[float]:
+        """Seconds requested by the server's Retry-After header, if it sent one"""
+        headers = getattr(getattr(error, 'response', None), 'headers', None)
+        if not headers:
+            return None
+        try:
+            return max(float(headers.get('retry-after')), 0.0)
+        except (TypeError, ValueError):
+            # Missing, or an HTTP-date, which Google APIs do not send
+            return None
     
     def _prepare_habits_context(self, habits: List[Dict[str, Any]]) -> str:
         """Prepare context string from existing habits"""
         if not habits:
             return "User has no existing habits yet."
         
-        context_parts = []
-        categories = {}
-        
-        for habit in habits:
-            category = habit.get('category', 'Uncategorized')
-            categories[category] = categories.get(category, 0) + 1
-            
-            context_parts.append(
-                f"- {habit.get('name', 'Unknown')} ({habit.get('frequency', 'daily')}, {category})"
-            )
+        categories = Counter(habit.get('category', 'Uncategorized') for habit in habits)
+        context_parts = [
+            f"- {habit.get('name', 'Unknown')} ({habit.get('frequency', 'daily')}, {habit.get('category', 'Uncategorized')})"
+            for habit in habits
+        ]
         
         context = "Existing habits:\n" + "\n".join(context_parts)
         
@@ -158,51 +560,21 @@ class AIService:
     
     def _create_suggestion_prompt(self, habits_context: str, user_goals: str) -> str:
         """Create the prompt for Gemini AI"""
-        prompt = f"""
-You are a habit formation expert and personal development coach. Based on the user's existing habits, suggest 1 new habit that would complement their current routine and help them build a more balanced lifestyle.
-
-{habits_context}
-
-User Goals: {user_goals or "General personal improvement"}
-
-Please suggest 1 new habit that:
-1. Complements their existing habits (don't duplicate)
-2. Fills gaps in their routine (e.g., if they only have health habits, suggest personal development)
-3. Is realistic and achievable
-4. Covers an important life area (health, personal, productivity, relationships, learning)
-
-For each suggestion, provide:
-- A catchy, motivating name
-- A clear, actionable description
-- An appropriate category (Health, Personal, Productivity, Learning, Relationships, Finance, etc.)
-- Frequency (daily or weekly)
-
-Format your response as a JSON array with this exact structure:
-[
-  {{
-    "name": "Habit Name",
-    "description": "Clear description of what to do",
-    "category": "Category Name",
-    "frequency": "daily or weekly",
-    "reason": "Why this habit would be beneficial for them"
-  }}
-]
-
-Make the suggestions specific, actionable, and personalized to their current habit profile.
-"""
-        return prompt
+        # Static instructions first, user data last, so the prefix is byte-identical across calls
+        return (
+            self._SUGGESTION_PREFIX
+            + self._USER_CONTEXT_DELIMITER
+            + habits_context
+            + f"\n\nUser Goals: {user_goals or 'General personal improvement'}\n"
+        )
     
-    def _parse_ai_response(self, response_text: str) -> List[Dict[str, str]]:
-        """Parse the AI response and extract habit suggestions"""
+    def _parse_ai_response(self, response_text: str) -> Optional[List[Dict[str, str]]]:
+        """Parse the AI response and extract habit suggestions, or None if it has no valid ones"""
         try:
-            # Try to extract JSON from the response
-            import re
-            
             # Look for JSON array in the response
-            json_match = re.search(r'\[.*\]', response_text, re.DOTALL)
+            json_match = _JSON_ARRAY_RE.search(response_text)
             if json_match:
-                json_str = json_match.group()
-                suggestions = json.loads(json_str)
+                suggestions = orjson.loads(json_match.group())
                 
                 # Validate and clean the suggestions
                 cleaned_suggestions = []
@@ -216,32 +588,54 @@ Make the suggestions specific, actionable, and personalized to their current hab
                             'reason': suggestion.get('reason', '').strip()
                         })
                 
-                return cleaned_suggestions[:1]  # Limit to 1 suggestion
+                if cleaned_suggestions:
+                    return cleaned_suggestions[:1]  # Limit to 1 suggestion
             
-            # If no JSON found, return fallback suggestions
+            # If no valid suggestion was found, the caller uses the fallback suggestions
             self.logger.warning("No valid JSON found in AI response, using fallback suggestions")
-            return self._get_fallback_suggestions()
+            return None
             
-        except (json.JSONDecodeError, Exception) as e:
-            self.logger.error(f"Error parsing AI response: {str(e)}")
-            return self._get_fallback_suggestions()
+        except (orjson.JSONDecodeError, Exception) as e:
+            self.logger.error("Error parsing AI response: %s", e)
+            return None
     
     def _validate_suggestion(self, suggestion: Dict) -> bool:
         """Validate that a suggestion has required fields"""
         required_fields = ['name', 'description', 'category', 'frequency']
         return all(field in suggestion and suggestion[field] for field in required_fields)
     
+    def _drop_duplicate_suggestions(self, suggestions: List[Dict[str, str]],
+                                    existing_habits: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """Drop suggestions whose name nearly matches an existing habit"""
+        existing_names = [_normalize_habit_name(habit.get('name', '')) for habit in existing_habits]
+        existing_names = [name for name in existing_names if name]
+        if not existing_names:
+            return suggestions
+        
+        def is_duplicate(suggestion):
+            name = _normalize_habit_name(suggestion.get('name', ''))
+            for existing in existing_names:
+                matcher = SequenceMatcher(None, name, existing)
+                # Cheap upper bounds first; the full ratio only runs on close candidates
+                if (matcher.real_quick_ratio() >= DUPLICATE_NAME_RATIO
+                        and matcher.quick_ratio() >= DUPLICATE_NAME_RATIO
+                        and matcher.ratio() >= DUPLICATE_NAME_RATIO):
+                    return True
+            return False
+        
+        unique = [suggestion for suggestion in suggestions if not is_duplicate(suggestion)]
+        if len(unique) < len(suggestions):
+            self.logger.info("Dropped %d duplicate habit suggestions", len(suggestions) - len(unique))
+            if not unique:
+                # Logic: a duplicate is not worth a second round-trip; fall back locally
+                unique = [suggestion for suggestion in self._get_fallback_suggestions()
+                          if not is_duplicate(suggestion)]
+        return unique
+    
     def _get_fallback_suggestions(self) -> List[Dict[str, str]]:
         """Provide fallback suggestions if AI fails"""
-        return [
-            {
-                'name': 'Morning Meditation',
-                'description': 'Spend 10 minutes meditating or practicing mindfulness each morning',
-                'category': 'Personal',
-                'frequency': 'daily',
-                'reason': 'Helps reduce stress and improve focus throughout the day'
-            }
-        ]
+        # Fresh shallow copies so callers can never mutate the shared constants
+        return [dict(suggestion) for suggestion in self._FALLBACK_SUGGESTIONS]
     
     def analyze_habit_patterns(self, habits: List[Dict[str, Any]], checkins: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
@@ -258,96 +652,75 @@ Make the suggestions specific, actionable, and personalized to their current hab
             # Prepare data for analysis
             analysis_context = self._prepare_analysis_context(habits, checkins)
             
-            prompt = f"""
-You are a habit analyst. Based on the user's habit data, provide insights and recommendations.
-
-{analysis_context}
-
-Please analyze their habits and provide:
-1. Overall performance assessment
-2. Strengths (what they're doing well)
-3. Areas for improvement
-4. Specific recommendations for better habit formation
-
-Format as JSON:
-{{
-  "performance_score": "number between 1-10",
-  "strengths": ["strength1", "strength2", "strength3"],
-  "improvements": ["improvement1", "improvement2"],
-  "recommendations": ["recommendation1", "recommendation2", "recommendation3"]
-}}
-"""
+            prompt = self._ANALYSIS_PREFIX + self._USER_CONTEXT_DELIMITER + analysis_context + "\n"
             
-            # Use retry logic for analysis as well
-            response = self._generate_with_retry(prompt)
-            return self._parse_analysis_response(response.text)
+            # Use retry logic (and the response cache) for analysis as well
+            analysis = self._generate_cached(prompt, self._parse_analysis_response, config=self._analysis_config)
+            return analysis if analysis is not None else self._get_fallback_analysis()
             
         except Exception as e:
-            self.logger.error(f"Error analyzing habit patterns: {str(e)}")
+            self.logger.error("Error analyzing habit patterns: %s", e)
+            return self._get_fallback_analysis()
+    
+    async def aanalyze_habit_patterns(self, habits: List[Dict[str, Any]], checkins: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Async version of analyze_habit_patterns"""
+        try:
+            analysis_context = self._prepare_analysis_context(habits, checkins)
+            prompt = self._ANALYSIS_PREFIX + self._USER_CONTEXT_DELIMITER + analysis_context + "\n"
+            analysis = await self._agenerate_cached(prompt, self._parse_analysis_response, self._analysis_config)
+            return analysis if analysis is not None else self._get_fallback_analysis()
+            
+        except Exception as e:
+            self.logger.error("Error analyzing habit patterns: %s", e)
             return self._get_fallback_analysis()
     
     def _prepare_analysis_context(self, habits: List[Dict], checkins: List[Dict]) -> str:
         """Prepare context for habit analysis"""
         # Count habits by category
-        categories = {}
-        for habit in habits:
-            cat = habit.get('category', 'Uncategorized')
-            categories[cat] = categories.get(cat, 0) + 1
-        
-        # Calculate success rates
-        habit_stats = {}
-        for checkin in checkins:
-            habit_id = checkin.get('habit_id')
-            if habit_id not in habit_stats:
-                habit_stats[habit_id] = {'total': 0, 'completed': 0}
-            
-            habit_stats[habit_id]['total'] += 1
-            if checkin.get('completed'):
-                habit_stats[habit_id]['completed'] += 1
+        categories = Counter(habit.get('category', 'Uncategorized') for habit in habits)
+        
+        # Calculate success rates: per-habit totals and completions, counted in C
+        totals = Counter(checkin.get('habit_id') for checkin in checkins)
+        completed = Counter(checkin.get('habit_id') for checkin in checkins if checkin.get('completed'))
         
         context = f"User has {len(habits)} habits across {len(categories)} categories.\n"
         context += f"Categories: {', '.join(categories.keys())}\n"
         
-        if habit_stats:
+        if totals:
             avg_success_rate = sum(
-                stats['completed'] / stats['total'] if stats['total'] > 0 else 0 
-                for stats in habit_stats.values()
-            ) / len(habit_stats) * 100
+                completed[habit_id] / total for habit_id, total in totals.items()
+            ) / len(totals) * 100
             
             context += f"Average success rate: {avg_success_rate:.1f}%"
         
         return context
     
-    def _parse_analysis_response(self, response_text: str) -> Dict[str, Any]:
-        """Parse analysis response from AI"""
+    def _parse_analysis_response(self, response_text: str) -> Optional[Dict[str, Any]]:
+        """Parse analysis response from AI, or None if it has no JSON object"""
         try:
-            import re
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
+            json_match = _JSON_OBJECT_RE.search(response_text)
             if json_match:
-                return json.loads(json_match.group())
+                return orjson.loads(json_match.group())
         except Exception as e:
-            self.logger.error(f"Error parsing analysis response: {str(e)}")
+            self.logger.error("Error parsing analysis response: %s", e)
         
-        return self._get_fallback_analysis()
+        return None
     
     def _get_fallback_analysis(self) -> Dict[str, Any]:
         """Fallback analysis if AI fails"""
         return {
-            "performance_score": 7,
-            "strengths": [
-                "Consistent habit tracking",
-                "Diverse habit categories",
-                "Good habit variety"
-            ],
-            "improvements": [
-                "Increase completion rates",
-                "Add more specific goals",
-                "Improve habit timing"
-            ],
-            "recommendations": [
-                "Set specific, measurable goals for each habit",
-                "Try habit stacking - link new habits to existing ones",
-                "Focus on consistency over perfection"
-            ]
+            key: list(value) if isinstance(value, tuple) else value
+            for key, value in self._FALLBACK_ANALYSIS.items()
         }
 
+_ai_service = None
+_ai_service_lock = threading.Lock()
+
+def get_ai_service() -> AIService:
+    """Return the process-wide AIService, creating it on first use"""
+    global _ai_service
+    if _ai_service is None:
+        with _ai_service_lock:
+            if _ai_service is None:
+                _ai_service = AIService()
+    return _ai_service
@@ -3,76 +3,164 @@ PDF Report Generation Service for Habit Hero
 Generates comprehensive habit progress reports in PDF format
 """
 
-from datetime import datetime, timedelta
+import heapq
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict, namedtuple
+from itertools import count
+from operator import sub
+from datetime import date, datetime
 from io import BytesIO
-from reportlab.lib.pagesizes import letter, A4
+# Only the reportlab pieces the report uses (nothing here draws charts). routes/reports.py
+# imports this module on the first PDF request, so app startup does not load reportlab
+from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib.colors import HexColor, black, white
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
-from reportlab.platypus import Image as RLImage
-from reportlab.graphics.shapes import Drawing, Rect, String
-from reportlab.graphics.charts.barcharts import VerticalBarChart
-from reportlab.graphics.charts.piecharts import Pie
-from reportlab.graphics import renderPDF
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
-import os
+from reportlab.lib.enums import TA_CENTER, TA_LEFT
 
-class PDFReportService:
-    def __init__(self):
-        self.styles = getSampleStyleSheet()
-        self._setup_custom_styles()
-    
-    def _setup_custom_styles(self):
-        """Setup custom styles for the PDF report"""
+# C-implemented YYYY-MM-DD parser, much cheaper than strptime
+_parse_date = date.fromisoformat
+
+# Report colors, parsed once instead of on every HexColor() call
+PRIMARY_COLOR = HexColor('#667eea')
+LIGHT_BACKGROUND_COLOR = HexColor('#f8f9ff')
+GRID_COLOR = HexColor('#e0e0e0')
+
+# Table styles are static, so they are built once and shared by every report
+# Title page quick stats table
+STATS_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, -1), LIGHT_BACKGROUND_COLOR),
+    ('TEXTCOLOR', (0, 0), (-1, -1), black),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+    ('BACKGROUND', (0, 0), (0, -1), PRIMARY_COLOR),
+    ('TEXTCOLOR', (0, 0), (0, -1), white),
+    ('GRID', (0, 0), (-1, -1), 1, black)
+])
+
+# Habits by category table
+CATEGORY_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), PRIMARY_COLOR),
+    ('TEXTCOLOR', (0, 0), (-1, 0), white),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ('GRID', (0, 0), (-1, -1), 1, black)
+])
+
+# Habit performance and streak analysis table
+HABIT_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), PRIMARY_COLOR),
+    ('TEXTCOLOR', (0, 0), (-1, 0), white),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 9),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+    ('GRID', (0, 0), (-1, -1), 1, black),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE')
+])
+
+# Recent activity & notes table
+ACTIVITY_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), PRIMARY_COLOR),
+    ('TEXTCOLOR', (0, 0), (-1, 0), white),
+    ('ALIGN', (0, 0), (2, -1), 'CENTER'),  # Center align date, habit, status
+    ('ALIGN', (3, 1), (3, -1), 'LEFT'),    # Left align notes column
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 9),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ('TOPPADDING', (0, 0), (-1, -1), 8),
+    ('GRID', (0, 0), (-1, -1), 1, GRID_COLOR),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [LIGHT_BACKGROUND_COLOR, white]),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -1), 8)
+])
+
+# Streak status labels: 0 days, 1-2, 3-6 and 7+ (bisect_right over the thresholds picks the label)
+STREAK_STATUS_THRESHOLDS = (1, 3, 7)
+STREAK_STATUS_LABELS = ("⏸️ Needs Attention", "🌱 Starting", "📈 Building", "🔥 On Fire")
+
+# Pre-formatted per-habit cells shared by the performance and streak tables
+HabitSummary = namedtuple('HabitSummary', ['success_rate', 'current_streak', 'longest_streak', 'status'])
+
+# Shared stylesheet, built on first use (styles are never modified after setup)
+_STYLES = None
+
+def _report_styles():
+    """Return the report stylesheet, building it once per process"""
+    global _STYLES
+    if _STYLES is None:
+        styles = getSampleStyleSheet()
+        
         # Title style
-        self.styles.add(ParagraphStyle(
+        styles.add(ParagraphStyle(
             name='CustomTitle',
-            parent=self.styles['Heading1'],
+            parent=styles['Heading1'],
             fontSize=24,
             spaceAfter=30,
             alignment=TA_CENTER,
-            textColor=HexColor('#667eea')
+            textColor=PRIMARY_COLOR
         ))
         
         # Section heading style
-        self.styles.add(ParagraphStyle(
+        styles.add(ParagraphStyle(
             name='CustomHeading',
-            parent=self.styles['Heading2'],
+            parent=styles['Heading2'],
             fontSize=16,
             spaceAfter=12,
             textColor=HexColor('#2c3e50')
         ))
         
         # Subheading style
-        self.styles.add(ParagraphStyle(
+        styles.add(ParagraphStyle(
             name='CustomSubHeading',
-            parent=self.styles['Heading3'],
+            parent=styles['Heading3'],
             fontSize=14,
             spaceAfter=8,
             textColor=HexColor('#34495e')
         ))
         
         # Body text style
-        self.styles.add(ParagraphStyle(
+        styles.add(ParagraphStyle(
             name='CustomBody',
-            parent=self.styles['Normal'],
+            parent=styles['Normal'],
             fontSize=11,
             spaceAfter=6,
             alignment=TA_LEFT
         ))
         
         # Stats style
-        self.styles.add(ParagraphStyle(
+        styles.add(ParagraphStyle(
             name='StatsText',
-            parent=self.styles['Normal'],
+            parent=styles['Normal'],
             fontSize=12,
             spaceAfter=4,
             alignment=TA_LEFT,
             textColor=HexColor('#27ae60')
         ))
+        
+        # Logic: Publish only the finished sheet, so concurrent first requests never see a partial one
+        _STYLES = styles
+    return _STYLES
 
-    def generate_habit_report(self, habits_data, checkins_data, analytics_data, date_range=None):
+def _append(elements, text, style, spacer=None):
+    """Append a paragraph, and optionally a vertical spacer after it, to a section"""
+    elements.append(Paragraph(text, style))
+    if spacer:
+        elements.append(Spacer(1, spacer))
+
+class PDFReportService:
+    def __init__(self):
+        self.styles = _report_styles()
+
+    def generate_habit_report(self, habits_data, checkins_data, analytics_data, date_range=None, output=None,
+                              max_habits=200, max_checkins_per_habit=730, already_sorted_desc=False,
+                              truncated=False):
         """
         Generate a comprehensive habit progress report
         
@@ -81,35 +169,72 @@ class PDFReportService:
             checkins_data: List of check-in objects
             analytics_data: Overall analytics data
             date_range: Tuple of (start_date, end_date) or None for all time
+            output: Writable binary stream for the PDF, defaults to a new BytesIO
+            max_habits: Habits listed in the per-habit tables
+            max_checkins_per_habit: Most recent check-ins per habit used for its rates and streaks
+            already_sorted_desc: True if checkins_data is ordered newest first, which lets
+                the recent-activity and capping steps slice instead of selecting
+            truncated: True if the caller already capped check-ins before passing them in
             
         Returns:
-            BytesIO object containing the PDF
+            The output stream containing the PDF, rewound to the start
         """
-        buffer = BytesIO()
+        buffer = output if output is not None else BytesIO()
         doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72,
                               topMargin=72, bottomMargin=18)
         
-        # Build the PDF content
-        story = []
-        
-        # Add title page
-        story.extend(self._create_title_page(analytics_data, date_range))
-        story.append(PageBreak())
-        
-        # Add executive summary
-        story.extend(self._create_executive_summary(habits_data, analytics_data))
-        story.append(PageBreak())
-        
-        # Add habit performance section
-        story.extend(self._create_habit_performance(habits_data, checkins_data))
-        story.append(PageBreak())
-        
-        # Add streak analysis
-        story.extend(self._create_streak_analysis(habits_data, checkins_data))
-        story.append(PageBreak())
+        # Logic: Group check-ins by habit once, so each section does dict lookups
+        # instead of rescanning every check-in for every habit
+        checkins_by_habit = defaultdict(list)
+        completed_by_habit = defaultdict(list)
+        for checkin in checkins_data:
+            # Parse each ISO date once; the streak and timeline code compare dates
+            checkin['_date'] = _parse_date(checkin['date'])
+            checkins_by_habit[checkin['habit_id']].append(checkin)
+            if checkin['completed']:
+                completed_by_habit[checkin['habit_id']].append(checkin)
+        
+        # Logic: Cap the per-habit work to what the report can usefully show;
+        # the summary and timeline still see everything
+        report_habits = habits_data[:max_habits]
+        truncated = truncated or len(habits_data) > max_habits
+        for habit_id, habit_checkins in checkins_by_habit.items():
+            if len(habit_checkins) > max_checkins_per_habit:
+                truncated = True
+                if already_sorted_desc:
+                    # Grouping keeps input order, so each habit's list is newest first too
+                    habit_checkins = habit_checkins[:max_checkins_per_habit]
+                else:
+                    habit_checkins = heapq.nlargest(max_checkins_per_habit, habit_checkins, key=lambda x: x['_date'])
+                checkins_by_habit[habit_id] = habit_checkins
+                completed_by_habit[habit_id] = [c for c in habit_checkins if c['completed']]
+        
+        # Each habit's cells are computed and formatted once and shared by both sections
+        summaries = {
+            habit['id']: self._summarize_habit(
+                checkins_by_habit.get(habit['id']), completed_by_habit.get(habit['id'])
+            )
+            for habit in report_habits
+        }
+        
+        # Build the PDF content: title page, executive summary, habit performance,
+        # streak analysis, then timeline and notes
+        sections = [
+            self._create_title_page(analytics_data, date_range),
+            self._create_executive_summary(habits_data, analytics_data),
+            self._create_habit_performance(report_habits, summaries, truncated),
+            self._create_streak_analysis(report_habits, summaries),
+            self._create_timeline_notes(habits_data, checkins_data, date_range, already_sorted_desc)
+        ]
         
-        # Add timeline and notes
-        story.extend(self._create_timeline_notes(habits_data, checkins_data, date_range))
+        # Logic: Empty sections are left out along with their page breaks,
+        # so ReportLab never lays out header-only tables
+        story = []
+        for section in sections:
+            if section:
+                if story:
+                    story.append(PageBreak())
+                story.extend(section)
         
         # Build PDF
         doc.build(story)
@@ -123,22 +248,16 @@ class PDFReportService:
         elements = []
         
         # Main title
-        title = Paragraph("Habit Hero Progress Report", self.styles['CustomTitle'])
-        elements.append(title)
-        elements.append(Spacer(1, 20))
+        _append(elements, "Habit Hero Progress Report", self.styles['CustomTitle'], spacer=20)
         
         # Report date
         report_date = datetime.now().strftime("%B %d, %Y")
-        date_para = Paragraph(f"Generated on: {report_date}", self.styles['CustomBody'])
-        elements.append(date_para)
-        elements.append(Spacer(1, 10))
+        _append(elements, f"Generated on: {report_date}", self.styles['CustomBody'], spacer=10)
         
         # Date range if specified
         if date_range:
             start_date, end_date = date_range
-            range_para = Paragraph(f"Report Period: {start_date} to {end_date}", self.styles['CustomBody'])
-            elements.append(range_para)
-            elements.append(Spacer(1, 20))
+            _append(elements, f"Report Period: {start_date} to {end_date}", self.styles['CustomBody'], spacer=20)
         else:
             elements.append(Spacer(1, 20))
         
@@ -151,17 +270,7 @@ class PDFReportService:
         ]
         
         stats_table = Table(stats_data, colWidths=[2*inch, 1.5*inch])
-        stats_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, -1), HexColor('#f8f9ff')),
-            ('TEXTCOLOR', (0, 0), (-1, -1), black),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-            ('BACKGROUND', (0, 0), (0, -1), HexColor('#667eea')),
-            ('TEXTCOLOR', (0, 0), (0, -1), white),
-            ('GRID', (0, 0), (-1, -1), 1, black)
-        ]))
+        stats_table.setStyle(STATS_TABLE_STYLE)
         
         elements.append(stats_table)
         elements.append(Spacer(1, 30))
@@ -173,9 +282,7 @@ class PDFReportService:
         elements = []
         
         # Section title
-        title = Paragraph("Executive Summary", self.styles['CustomHeading'])
-        elements.append(title)
-        elements.append(Spacer(1, 12))
+        _append(elements, "Executive Summary", self.styles['CustomHeading'], spacer=12)
         
         # Summary content
         total_habits = len(habits_data)
@@ -190,261 +297,198 @@ class PDFReportService:
         demonstrating your commitment to building better habits.
         """
         
-        summary_para = Paragraph(summary_text, self.styles['CustomBody'])
-        elements.append(summary_para)
-        elements.append(Spacer(1, 20))
+        _append(elements, summary_text, self.styles['CustomBody'], spacer=20)
         
-        # Category breakdown
-        categories = {}
-        for habit in habits_data:
-            category = habit.get('category', 'Uncategorized')
-            categories[category] = categories.get(category, 0) + 1
+        # Category breakdown, largest categories first
+        categories = Counter(habit.get('category', 'Uncategorized') for habit in habits_data)
         
         if categories:
-            cat_title = Paragraph("Habits by Category", self.styles['CustomSubHeading'])
-            elements.append(cat_title)
-            elements.append(Spacer(1, 8))
+            _append(elements, "Habits by Category", self.styles['CustomSubHeading'], spacer=8)
             
-            cat_data = [['Category', 'Count', 'Percentage']]
-            for category, count in categories.items():
-                percentage = round((count / total_habits) * 100, 1)
-                cat_data.append([category, str(count), f"{percentage}%"])
+            percent_per_habit = 100.0 / total_habits
+            cat_data = [['Category', 'Count', 'Percentage']] + [
+                [category, str(count), f"{count * percent_per_habit:.1f}%"]
+                for category, count in categories.most_common()
+            ]
             
             cat_table = Table(cat_data, colWidths=[2*inch, 1*inch, 1*inch])
-            cat_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), HexColor('#667eea')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), white),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-                ('GRID', (0, 0), (-1, -1), 1, black)
-            ]))
+            cat_table.setStyle(CATEGORY_TABLE_STYLE)
             
             elements.append(cat_table)
         
         return elements
 
-    def _create_habit_performance(self, habits_data, checkins_data):
-        """Create habit performance section"""
+    def _create_habit_performance(self, habits_data, summaries, truncated=False):
+        """Create habit performance section from the per-habit summaries"""
+        if not habits_data:
+            return []
+        
         elements = []
         
         # Section title
-        title = Paragraph("Habit Performance", self.styles['CustomHeading'])
-        elements.append(title)
-        elements.append(Spacer(1, 12))
+        _append(elements, "Habit Performance", self.styles['CustomHeading'], spacer=12)
         
-        # Calculate performance for each habit
-        performance_data = [['Habit Name', 'Category', 'Frequency', 'Success Rate', 'Current Streak']]
+        if truncated:
+            # Tell the reader the tables below are capped
+            _append(
+                elements,
+                f"Showing up to {len(habits_data)} habits, based on each habit's most recent check-ins.",
+                self.styles['CustomBody'],
+                spacer=8
+            )
         
-        for habit in habits_data:
-            habit_id = habit['id']
-            habit_checkins = [c for c in checkins_data if c['habit_id'] == habit_id]
-            
-            if habit_checkins:
-                total_checkins = len(habit_checkins)
-                completed_checkins = len([c for c in habit_checkins if c['completed']])
-                success_rate = round((completed_checkins / total_checkins) * 100, 1)
-            else:
-                success_rate = 0
-            
-            # Calculate current streak (simplified)
-            current_streak = self._calculate_current_streak(habit_checkins)
-            
-            performance_data.append([
+        # Calculate performance for each habit
+        performance_data = [['Habit Name', 'Category', 'Frequency', 'Success Rate', 'Current Streak']] + [
+            [
                 habit['name'],
                 habit['category'],
                 habit['frequency'],
-                f"{success_rate}%",
-                f"{current_streak} days"
-            ])
+                summaries[habit['id']].success_rate,
+                summaries[habit['id']].current_streak
+            ]
+            for habit in habits_data
+        ]
         
         # Create performance table
         perf_table = Table(performance_data, colWidths=[2*inch, 1.2*inch, 0.8*inch, 1*inch, 1*inch])
-        perf_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), HexColor('#667eea')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), white),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 9),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ('GRID', (0, 0), (-1, -1), 1, black),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE')
-        ]))
+        perf_table.setStyle(HABIT_TABLE_STYLE)
         
         elements.append(perf_table)
         
         return elements
 
-    def _create_streak_analysis(self, habits_data, checkins_data):
-        """Create streak analysis section"""
+    def _create_streak_analysis(self, habits_data, summaries):
+        """Create streak analysis section from the per-habit summaries"""
+        if not habits_data:
+            return []
+        
         elements = []
         
         # Section title
-        title = Paragraph("Streak Analysis", self.styles['CustomHeading'])
-        elements.append(title)
-        elements.append(Spacer(1, 12))
+        _append(elements, "Streak Analysis", self.styles['CustomHeading'], spacer=12)
         
         # Analyze streaks for each habit
-        streak_data = [['Habit Name', 'Current Streak', 'Longest Streak', 'Streak Status']]
-        
-        for habit in habits_data:
-            habit_id = habit['id']
-            habit_checkins = [c for c in checkins_data if c['habit_id'] == habit_id and c['completed']]
-            
-            if habit_checkins:
-                current_streak = self._calculate_current_streak(habit_checkins)
-                longest_streak = self._calculate_longest_streak(habit_checkins)
-                
-                # Determine streak status
-                if current_streak >= 7:
-                    status = "🔥 On Fire"
-                elif current_streak >= 3:
-                    status = "📈 Building"
-                elif current_streak > 0:
-                    status = "🌱 Starting"
-                else:
-                    status = "⏸️ Needs Attention"
-            else:
-                current_streak = 0
-                longest_streak = 0
-                status = "🆕 New Habit"
-            
-            streak_data.append([
+        streak_data = [['Habit Name', 'Current Streak', 'Longest Streak', 'Streak Status']] + [
+            [
                 habit['name'],
-                f"{current_streak} days",
-                f"{longest_streak} days",
-                status
-            ])
+                summaries[habit['id']].current_streak,
+                summaries[habit['id']].longest_streak,
+                summaries[habit['id']].status
+            ]
+            for habit in habits_data
+        ]
         
         # Create streak table
         streak_table = Table(streak_data, colWidths=[2.5*inch, 1.2*inch, 1.2*inch, 1.5*inch])
-        streak_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), HexColor('#667eea')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), white),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 9),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ('GRID', (0, 0), (-1, -1), 1, black),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE')
-        ]))
+        streak_table.setStyle(HABIT_TABLE_STYLE)
         
         elements.append(streak_table)
         
         return elements
 
-    def _create_timeline_notes(self, habits_data, checkins_data, date_range):
+    def _create_timeline_notes(self, habits_data, checkins_data, date_range, already_sorted_desc=False):
         """Create timeline and notes section with table format"""
+        if not habits_data:
+            return []
+        
         elements = []
         
         # Section title
-        title = Paragraph("Recent Activity & Notes", self.styles['CustomHeading'])
-        elements.append(title)
-        elements.append(Spacer(1, 12))
+        _append(elements, "Recent Activity & Notes", self.styles['CustomHeading'], spacer=12)
         
         # Create habit lookup dictionary
         habit_lookup = {habit['id']: habit['name'] for habit in habits_data}
         
-        # Sort all check-ins by date (most recent first)
-        sorted_checkins = sorted(checkins_data, key=lambda x: x['date'], reverse=True)
-        
-        if sorted_checkins:
-            # Prepare table data - show last 15 activities
-            table_data = [['Date', 'Habit', 'Status', 'Notes']]
-            
-            for checkin in sorted_checkins[:15]:
-                # Format date
-                date_str = datetime.strptime(checkin['date'], '%Y-%m-%d').strftime('%m/%d/%Y')
-                
-                # Get habit name
-                habit_name = habit_lookup.get(checkin['habit_id'], 'Unknown Habit')
-                
-                # Status
-                status = "✅ Completed" if checkin['completed'] else "❌ Missed"
-                
-                # Notes (truncate if too long)
-                notes = checkin.get('notes', '').strip()
-                if len(notes) > 50:
-                    notes = notes[:47] + "..."
-                if not notes:
-                    notes = "-"
-                
-                table_data.append([date_str, habit_name, status, notes])
+        # Last 15 activities, most recent first (a slice of presorted input,
+        # otherwise a partial heap select rather than a full sort)
+        if already_sorted_desc:
+            recent_checkins = checkins_data[:15]
+        else:
+            recent_checkins = heapq.nlargest(15, checkins_data, key=lambda x: x['_date'])
+        
+        if recent_checkins:
+            # Prepare table data
+            table_data = [['Date', 'Habit', 'Status', 'Notes']] + [
+                [
+                    checkin['_date'].strftime('%m/%d/%Y'),
+                    habit_lookup.get(checkin['habit_id'], 'Unknown Habit'),
+                    "✅ Completed" if checkin['completed'] else "❌ Missed",
+                    self._truncate_notes(checkin.get('notes'))
+                ]
+                for checkin in recent_checkins
+            ]
             
             # Create table
             activity_table = Table(table_data, colWidths=[1*inch, 2*inch, 1.2*inch, 2.3*inch])
-            activity_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), HexColor('#667eea')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), white),
-                ('ALIGN', (0, 0), (2, -1), 'CENTER'),  # Center align date, habit, status
-                ('ALIGN', (3, 1), (3, -1), 'LEFT'),    # Left align notes column
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 9),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-                ('TOPPADDING', (0, 0), (-1, -1), 8),
-                ('GRID', (0, 0), (-1, -1), 1, HexColor('#e0e0e0')),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [HexColor('#f8f9ff'), white]),
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 1), (-1, -1), 8)
-            ]))
+            activity_table.setStyle(ACTIVITY_TABLE_STYLE)
             
             elements.append(activity_table)
         else:
-            no_activity = Paragraph("No activity recorded yet.", self.styles['CustomBody'])
-            elements.append(no_activity)
+            _append(elements, "No activity recorded yet.", self.styles['CustomBody'])
         
         return elements
 
-    def _calculate_current_streak(self, checkins_data):
-        """Calculate current streak from check-ins"""
-        if not checkins_data:
-            return 0
-        
-        # Sort check-ins by date (most recent first)
-        sorted_checkins = sorted(checkins_data, key=lambda x: x['date'], reverse=True)
-        
-        today = datetime.now().date()
-        current_date = today
-        streak_count = 0
-        
-        # Check consecutive days backwards from today
-        for checkin in sorted_checkins:
-            checkin_date = datetime.strptime(checkin['date'], '%Y-%m-%d').date()
-            if checkin_date == current_date:
-                streak_count += 1
-                current_date -= timedelta(days=1)
-            elif checkin_date < current_date:
-                break
-        
-        return streak_count
-
-    def _calculate_longest_streak(self, checkins_data):
-        """Calculate longest streak from check-ins"""
-        if not checkins_data:
-            return 0
-        
-        # Sort check-ins by date
-        sorted_checkins = sorted(checkins_data, key=lambda x: x['date'])
-        
-        longest_streak = 0
-        current_streak = 0
-        last_date = None
+    def _calculate_streaks(self, checkins_data):
+        """Calculate (current streak, longest streak) from check-ins"""
+        days = sorted({c['_date'].toordinal() for c in checkins_data if c['completed']})
+        if not days:
+            return 0, 0
+        
+        # Logic: Within a run of consecutive days, day - position is constant, so counting
+        # those keys (all in C) gives every run's length without a Python-level loop
+        run_keys = list(map(sub, days, count()))
+        longest_streak = max(Counter(run_keys).values())
+        
+        # The current streak is the part of today's run up to and including today
+        today = date.today().toordinal()
+        position = bisect_left(days, today)
+        if position < len(days) and days[position] == today:
+            current_streak = position - bisect_left(run_keys, today - position) + 1
+        else:
+            current_streak = 0
         
-        for checkin in sorted_checkins:
-            checkin_date = datetime.strptime(checkin['date'], '%Y-%m-%d').date()
-            
-            if last_date is None:
-                current_streak = 1
-                last_date = checkin_date
-            else:
-                days_diff = (checkin_date - last_date).days
-                if days_diff == 1:  # Consecutive day
-                    current_streak += 1
-                else:  # Gap in dates
-                    longest_streak = max(longest_streak, current_streak)
-                    current_streak = 1
-                last_date = checkin_date
-        
-        return max(longest_streak, current_streak)
+        return current_streak, longest_streak
+    
+    @staticmethod
+    def _success_rate(total_count, completed_count):
+        """Completion percentage of a habit's check-ins, rounded to one decimal"""
+        return round((completed_count / total_count) * 100, 1) if total_count else 0
+    
+    def _summarize_habit(self, habit_checkins, completed_checkins):
+        """Formatted performance and streak cells for one habit"""
+        # The grouping pass already split completed check-ins out, so the
+        # success rate is two list lengths rather than another scan
+        total_count = len(habit_checkins) if habit_checkins else 0
+        completed_count = len(completed_checkins) if completed_checkins else 0
+        
+        if completed_checkins:
+            current_streak, longest_streak = self._calculate_streaks(completed_checkins)
+            status = self._streak_status(current_streak)
+        else:
+            current_streak = longest_streak = 0
+            status = "🆕 New Habit"
+        
+        # Current streak counts completed days only, in both sections
+        return HabitSummary(
+            success_rate=f"{self._success_rate(total_count, completed_count)}%",
+            current_streak=f"{current_streak} days",
+            longest_streak=f"{longest_streak} days",
+            status=status
+        )
+    
+    @staticmethod
+    def _streak_status(current_streak):
+        """Status label for a habit that has completed check-ins"""
+        return STREAK_STATUS_LABELS[bisect_right(STREAK_STATUS_THRESHOLDS, current_streak)]
+    
+    @staticmethod
+    def _truncate_notes(notes):
+        """Notes cell text: truncated to 50 characters, '-' when empty"""
+        notes = (notes or '').strip()
+        if len(notes) > 50:
+            notes = notes[:47] + "..."
+        return notes or "-"
+
+# Shared instance: the service only holds the read-only stylesheet, so
+# concurrent requests can use it safely
+pdf_report_service = PDFReportService()
@@ -0,0 +1,60 @@
+import unittest
+from datetime import datetime, timedelta
+from app import create_app, init_db
+from database import db
+from models import Habit, CheckIn
+from routes.analytics import _sql_streaks, _python_streaks, SQLITE_HAS_WINDOW_FUNCTIONS
+
+
+class CurrentStreakTest(unittest.TestCase):
+    """Current streak counts back from today, whatever lies after it"""
+
+    def setUp(self):
+        self.app = create_app('testing')
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        init_db()
+        self.today = datetime.now().date()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def add_habit(self, days_ago):
+        habit = Habit(name='Read', frequency='daily', category='Learning', start_date=self.today)
+        db.session.add(habit)
+        db.session.flush()
+        for offset in days_ago:
+            db.session.add(CheckIn(habit_id=habit.id, date=self.today - timedelta(days=offset), completed=True))
+        db.session.commit()
+        return habit
+
+    def assert_streaks(self, habit, longest, current):
+        _, current_python, _ = _python_streaks(habit.id, self.today)
+        self.assertEqual(current_python, current)
+        if SQLITE_HAS_WINDOW_FUNCTIONS:
+            row = _sql_streaks(habit.id, self.today)
+            self.assertEqual((row.longest_streak, row.current_streak), (longest, current))
+
+        response = self.app.test_client().get(f'/habits/{habit.id}/streak')
+        self.assertEqual(response.get_json()['current_streak'], current)
+        self.assertEqual(response.get_json()['longest_streak'], longest)
+
+    def test_future_checkin_extends_run(self):
+        # Tomorrow, today and the two days before form one four-day run
+        habit = self.add_habit([-1, 0, 1, 2])
+        self.assert_streaks(habit, longest=4, current=3)
+
+    def test_future_checkin_after_gap(self):
+        # A check-in two days ahead starts its own run
+        habit = self.add_habit([-2, 0, 1])
+        self.assert_streaks(habit, longest=2, current=2)
+
+    def test_no_checkin_today(self):
+        habit = self.add_habit([-1, 1, 2])
+        self.assert_streaks(habit, longest=2, current=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,24 +1,64 @@
 import os
+import sys
+import json
+import time
+from pathlib import Path
 from dotenv import load_dotenv
-import google.generativeai as genai
-
-# Load environment variables from .env if present
-load_dotenv()
-
-# Configure the API key from environment variable
-api_key = os.environ.get("GEMINI_API_KEY")
-if not api_key:
-    raise ValueError(
-        "GEMINI_API_KEY not found. Set it in your environment or .env file."
-    )
-
-genai.configure(api_key=api_key)
-
-try:
-    # List all available models
-    print("Available models:")
-    for model in genai.list_models():
-        if 'generateContent' in getattr(model, 'supported_generation_methods', []):
-            print(f"- {model.name}")
-except Exception as e:
-    print(f"Error listing models: {e}")
+
+# Model names are cached on disk for a day; pass --refresh to re-fetch
+CACHE_PATH = Path.home() / '.cache' / 'habit-hero' / 'gemini_models.json'
+CACHE_TTL = 86400  # seconds
+
+
+def load_cached_models():
+    """Return the cached model names, or None if the cache is missing or stale"""
+    try:
+        if time.time() - CACHE_PATH.stat().st_mtime < CACHE_TTL:
+            return json.loads(CACHE_PATH.read_text())
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def fetch_models(api_key):
+    """List the models that support generateContent from the Gemini API"""
+    import google.generativeai as genai
+
+    genai.configure(api_key=api_key)
+    return [
+        model.name
+        for model in genai.list_models()
+        if 'generateContent' in getattr(model, 'supported_generation_methods', [])
+    ]
+
+
+model_names = None if '--refresh' in sys.argv[1:] else load_cached_models()
+
+if model_names is None:
+    # Load environment variables from .env if present
+    load_dotenv()
+
+    # Configure the API key from environment variable
+    api_key = os.environ.get("GEMINI_API_KEY")
+    if not api_key:
+        raise ValueError(
+            "GEMINI_API_KEY not found. Set it in your environment or .env file."
+        )
+
+    try:
+        model_names = fetch_models(api_key)
+    except Exception as e:
+        print(f"Error listing models: {e}")
+        sys.exit(1)
+
+    # Logic: A failed cache write only costs the next run a network call
+    try:
+        CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        CACHE_PATH.write_text(json.dumps(model_names))
+    except OSError as e:
+        print(f"Could not write model cache: {e}")
+
+# List all available models
+print("Available models:")
+for name in model_names:
+    print(f"- {name}")